@@ -0,0 +1,43 @@
+"""
+cleaner benchmark
+=================
+
+Compares ``default_cleanerM`` against the precompiled ``Cleaner`` on a
+synthetic corpus.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_cleaner [lines]
+
+"""
+# stdlib
+import sys
+
+# project
+from benchmarks.corpus import corpus
+from benchmarks.timing import measure
+from optimus.core import parse
+
+
+def main(lines=200000):
+    texts, _ = corpus(lines)
+    cleaner = parse.Cleaner()
+
+    reference, t_reference, _ = measure(
+        lambda xs: list(parse.default_cleanerM(xs)), texts, memory=False
+    )
+    single, t_single, _ = measure(
+        lambda xs: list(map(cleaner, xs)), texts, memory=False
+    )
+    batch, t_batch, _ = measure(cleaner.clean_batch, texts, memory=False)
+
+    assert reference == single == batch
+
+    print(f"lines: {lines}, regex passes: {len(cleaner.passes)}")
+    print(f"default_cleanerM      {t_reference:8.3f}s")
+    print(f"Cleaner (per line)    {t_single:8.3f}s  x{t_reference / t_single:.1f}")
+    print(f"Cleaner.clean_batch   {t_batch:8.3f}s  x{t_reference / t_batch:.1f}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
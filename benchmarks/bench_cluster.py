@@ -0,0 +1,87 @@
+"""
+clustering backend benchmark
+============================
+
+Reports runtime and peak (numpy) memory of the clustering backends
+against the number of rows, on blobs of synthetic embeddings. The
+weighted ward linkage that deduplicated rows go through is compared
+with the unweighted ``scipy`` linkage it stands in for.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_cluster [max rows]
+
+"""
+
+# stdlib
+import sys
+
+# third party
+import numpy as np
+import scipy.cluster.hierarchy as clus
+
+# project
+from benchmarks.timing import measure
+from optimus.core import cluster
+
+
+def blobs(n, dimension=50, centres=20, seed=0):
+    """
+    Gaussian blobs around random centres
+
+    Parameters
+    ----------
+    n : int
+        number of rows
+
+    dimension : int
+        number of columns
+
+    centres : int
+        number of blobs
+
+    seed : int
+        random seed
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    rng = np.random.RandomState(seed)
+    means = rng.normal(0, 5, (centres, dimension))
+    return (
+        means[rng.randint(centres, size=n)] + rng.normal(size=(n, dimension))
+    ).astype(np.float32)
+
+
+def main(largest=16000, depth=50):
+    print(f"{'n':>8} {'backend':>10} {'seconds':>9} {'peak MiB':>9} {'clusters':>9}")
+    n = 1000
+    while n <= largest:
+        embedding = blobs(n)
+        for backend in cluster.backends:
+            clusters, elapsed, peak = measure(
+                cluster.cluster, embedding, depth, False, backend
+            )
+            print(
+                f"{n:>8} {backend:>10} {elapsed:>9.2f} {peak:>9.1f} "
+                f"{len(set(clusters)):>9}"
+            )
+
+        weights = np.random.RandomState(0).randint(1, 5, n)
+        baselines = {
+            "weighted": (cluster.ward, embedding, weights),
+            "scipy": (clus.linkage, embedding, "ward"),
+        }
+        for name, (function, *args) in baselines.items():
+            links, elapsed, peak = measure(function, *args)
+            clusters = clus.fcluster(links, depth, criterion="distance")
+            print(
+                f"{n:>8} {name:>10} {elapsed:>9.2f} {peak:>9.1f} "
+                f"{len(set(clusters)):>9}"
+            )
+        n *= 2
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,69 @@
+"""
+label representation benchmark
+==============================
+
+Compares building the result frame of ``run`` from a list of labels per
+depth (object columns) with building it from int32 codes into a shared
+string table (categorical columns).
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_labels [rows] [depths] [distinct labels]
+
+"""
+
+# stdlib
+import sys
+
+# third party
+import numpy as np
+import pandas as pd
+
+# project
+from benchmarks.timing import measure
+
+
+def coded(rows, depths, distinct, seed=0):
+    """
+    Label codes per depth, fewer distinct labels at every depth
+
+    Returns
+    -------
+    tuple[list[str], dict[str, numpy.ndarray]]
+        the string table and the codes of every depth
+    """
+    rng = np.random.RandomState(seed)
+    strings = [f"label {i}" for i in range(distinct)]
+    codes = {
+        f"{3 * (d + 1)}": rng.randint(max(distinct >> d, 1), size=rows).astype("int32")
+        for d in range(depths)
+    }
+    return strings, codes
+
+
+def lists(strings, codes):
+    labels = {name: [strings[c] for c in values] for name, values in codes.items()}
+    return pd.DataFrame.from_dict(labels, orient="index").transpose()
+
+
+def categoricals(strings, codes):
+    dtype = pd.CategoricalDtype(pd.Index(strings, dtype=object))
+    return pd.DataFrame(
+        {
+            name: pd.Categorical.from_codes(values, dtype=dtype)
+            for name, values in codes.items()
+        }
+    )
+
+
+def main(rows=100000, depths=5, distinct=10000):
+    strings, codes = coded(rows, depths, distinct)
+    print(f"{'representation':>15} {'seconds':>9} {'peak MiB':>9} {'frame MiB':>10}")
+    for function in (lists, categoricals):
+        frame, elapsed, peak = measure(function, strings, codes)
+        size = frame.memory_usage(deep=True).sum() / 2**20
+        print(f"{function.__name__:>15} {elapsed:>9.2f} {peak:>9.1f} {size:>10.1f}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,128 @@
+"""
+synthetic corpora
+=================
+
+Seeded generator of product description like corpora with a known cluster
+structure, for the benchmarks.
+
+Every line belongs to a family that shares a head noun. Lines of a family
+differ by their modifiers, misspellings and noise (quantities, codes), and
+some lines are exact repeats of others. The number of lines, size of the
+vocabulary, share of repeated lines and how the family sizes are
+distributed can all be varied.
+
+"""
+# third party
+import numpy as np
+
+consonants = "bcdfghklmnprstvz"
+vowels = "aeiou"
+noise = ["12", "500g", "x2", "(new)", "#1", "a/b", "&", "-", "100%", "kg."]
+
+
+def words(n, rng):
+    """
+    Distinct pronounceable made up words
+
+    Parameters
+    ----------
+    n : int
+
+    rng : numpy.random.RandomState
+
+    Returns
+    -------
+    list[str]
+    """
+    found = {}
+    while len(found) < n:
+        syllables = rng.randint(1, 4)
+        word = "".join(
+            rng.choice(list(consonants)) + rng.choice(list(vowels))
+            for _ in range(syllables)
+        )
+        found.setdefault(word + rng.choice(["", "n", "r", "t"]), None)
+    return list(found)
+
+
+def typo(word, rng):
+    """
+    Swap two neighbouring characters of a word
+    """
+    if len(word) < 4:
+        return word
+    i = rng.randint(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+
+
+def corpus(
+    lines,
+    vocabulary=2000,
+    duplicates=0.5,
+    families=None,
+    sizes="zipf",
+    exponent=1.2,
+    seed=0,
+):
+    """
+    Generate a synthetic corpus
+
+    Parameters
+    ----------
+    lines : int
+        number of lines
+
+    vocabulary : int
+        number of distinct words, a tenth of them are head nouns
+
+    duplicates : float
+        share of the lines that repeat an earlier line
+
+    families : int
+        number of families (true clusters), by default one per 20
+        distinct lines
+
+    sizes : str
+        distribution of the family sizes, "zipf" (a few large families
+        and many small ones) or "uniform"
+
+    exponent : float
+        exponent of the zipf distribution
+
+    seed : int
+        random seed
+
+    Returns
+    -------
+    tuple[list[str], numpy.ndarray]
+        the lines and the family of every line
+    """
+    rng = np.random.RandomState(seed)
+    vocab = words(vocabulary, rng)
+    heads, modifiers = vocab[: max(vocabulary // 10, 1)], vocab[vocabulary // 10 :]
+
+    distinct = max(int(round(lines * (1 - duplicates))), 1)
+    families = families or max(distinct // 20, 1)
+    weights = (
+        1.0 / np.arange(1, families + 1) ** exponent
+        if sizes == "zipf"
+        else np.ones(families)
+    )
+    family = rng.choice(families, size=distinct, p=weights / weights.sum())
+
+    texts = []
+    for f in family:
+        head = heads[f % len(heads)] + ("s" if rng.rand() < 0.3 else "")
+        tokens = list(rng.choice(modifiers, size=rng.randint(0, 4))) + [head]
+        if rng.rand() < 0.2:
+            tokens = [typo(token, rng) for token in tokens]
+        if rng.rand() < 0.3:
+            tokens.insert(rng.randint(len(tokens) + 1), rng.choice(noise))
+        texts.append(" ".join(tokens).title() if rng.rand() < 0.5 else " ".join(tokens))
+
+    # repeat lines to reach the share of duplicates
+    rows = np.concatenate(
+        [np.arange(distinct), rng.randint(distinct, size=lines - distinct)]
+    )
+    rng.shuffle(rows)
+    return [texts[row] for row in rows], family[rows]
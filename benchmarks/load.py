@@ -0,0 +1,115 @@
+"""
+service load test
+=================
+
+Starts the labelling service with the stand-in models on a Unix socket and
+fires concurrent requests of a few lines each at it, from a synthetic
+corpus. Reports the p50/p99 latency of the requests, the throughput and how
+many batches the requests were grouped into.
+
+Run from the repository root with::
+
+    python -m benchmarks.load [--clients 32] [--requests 20] [--lines 10]
+        [--kind parse|label] [--delay 0.005]
+
+"""
+# stdlib
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+# third party
+import numpy as np
+
+# project
+from benchmarks import standins
+from benchmarks.corpus import corpus
+from optimus.service import Service, serve, connect, call
+
+
+async def client(lines, requests, size, kind, unix, latencies):
+    """
+    Send requests one after the other over a connection
+    """
+    connection = await connect(unix=unix)
+    for i in range(requests):
+        start = time.perf_counter()
+        code, _ = await call(
+            connection, "POST", f"/{kind}", {"lines": lines[i * size : (i + 1) * size]}
+        )
+        latencies.append(time.perf_counter() - start)
+        assert code == 200
+    connection[1].close()
+
+
+async def load(service, lines, clients, requests, size, kind):
+    """
+    Serve and load the service, see ``main``
+
+    Returns
+    -------
+    tuple[list[float], float, dict]
+        the latency of every request, the total wall time and the stats
+        of the service
+    """
+    unix = os.path.join(tempfile.mkdtemp(), "optimus.sock")
+    server = asyncio.ensure_future(serve(service, unix=unix))
+    while not os.path.exists(unix):
+        await asyncio.sleep(0.01)
+
+    latencies, share = [], requests * size
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[
+            client(
+                lines[c * share : (c + 1) * share],
+                requests,
+                size,
+                kind,
+                unix,
+                latencies,
+            )
+            for c in range(clients)
+        ]
+    )
+    elapsed = time.perf_counter() - start
+
+    _, stats = await call(await connect(unix=unix), "GET", "/stats")
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+    return latencies, elapsed, stats
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=10, help="lines per request")
+    parser.add_argument("--kind", choices=["parse", "label"], default="parse")
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--delay", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(arguments)
+
+    standins.install()
+    total = args.clients * args.requests * args.lines
+    lines, _ = corpus(total, seed=args.seed)
+    service = Service(standins.Model(), batch=args.batch, delay=args.delay)
+    latencies, elapsed, stats = asyncio.run(
+        load(service, lines, args.clients, args.requests, args.lines, args.kind)
+    )
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    counters = stats["counters"]
+    print(f"requests     {len(latencies)} x {args.lines} lines ({args.kind})")
+    print(f"latency      p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    print(f"throughput   {len(latencies) / elapsed:.0f} requests/s")
+    print(f"             {total / elapsed:.0f} lines/s")
+    print(f"batches      {counters['service.batches']}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,135 @@
+"""
+stand-in models
+===============
+
+Lightweight local stand-ins for the spacy model, the fastText model and
+the wordnet lookup, so the benchmarks run offline on a CPU in seconds.
+
+They follow the interfaces optimus uses (``nlp.pipe``, tokens with
+``dep_``/``lemma_``, ``get_word_vector``, ``synsets``) with cheap rules:
+the last word of a text is its keyword, vectors are hashed character
+trigrams and every word hangs off a small made up taxonomy.
+
+"""
+# stdlib
+import zlib
+
+# third party
+import numpy as np
+
+# project
+from optimus.core import models
+
+
+class Token:
+    def __init__(self, text, dep):
+        self.text, self.dep_, self.pos_, self.lang_ = text, dep, "NOUN", "en"
+        self.lemma_ = text[:-1] if len(text) > 3 and text.endswith("s") else text
+
+
+class Vocab:
+    def __contains__(self, word):
+        return word.isalpha()
+
+
+class NLP:
+    """
+    spacy stand-in: whitespace tokens, the last one is the ROOT
+    """
+
+    pipe_names = ["tagger", "parser", "ner"]
+    vocab = Vocab()
+
+    def __call__(self, text):
+        words = text.split() or [""]
+        return [Token(word, "amod") for word in words[:-1]] + [Token(words[-1], "ROOT")]
+
+    def pipe(self, texts, batch_size=1000, n_process=1, disable=()):
+        return map(self, texts)
+
+
+class Model:
+    """
+    fastText stand-in: normalised counts of hashed character trigrams
+
+    Parameters
+    ----------
+    dimension : int
+    """
+
+    def __init__(self, dimension=50):
+        self.dimension = dimension
+
+    def get_dimension(self):
+        return self.dimension
+
+    def get_word_vector(self, word):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i : i + 3].encode()) % self.dimension] += 1
+        return vector / max(np.linalg.norm(vector), 1)
+
+
+class Synset:
+    """
+    wordnet synset stand-in
+    """
+
+    def __init__(self, name, parents=()):
+        self._name, self.parents = name, list(parents)
+
+    def name(self):
+        return self._name
+
+    def hypernyms(self):
+        return self.parents
+
+    def instance_hypernyms(self):
+        return []
+
+    def __lt__(self, other):
+        return self._name < other._name
+
+
+class Taxonomy:
+    """
+    Made up taxonomy: entity -> 8 groups -> 64 categories -> words
+    """
+
+    def __init__(self):
+        root = Synset("entity.n.01")
+        groups = [Synset(f"group{i}.n.01", [root]) for i in range(8)]
+        self.categories = [
+            Synset(f"category{i}.n.01", [groups[i % 8]]) for i in range(64)
+        ]
+        self.synsets = {}
+
+    def __call__(self, word):
+        if word not in self.synsets:
+            category = self.categories[zlib.crc32(word.encode()) % 64]
+            self.synsets[word] = (Synset(f"{word}.n.01", [category]),)
+        return self.synsets[word]
+
+
+taxonomy = Taxonomy()
+
+
+class Wordnet:
+    """
+    ``spacy_wordnet.wordnet_domains.Wordnet`` stand-in
+    """
+
+    def __init__(self, token, lang):
+        self.token = token
+
+    def synsets(self):
+        return taxonomy(self.token.lemma_) if self.token.text.isalpha() else ()
+
+
+def install():
+    """
+    Register the stand-ins in the model registry
+    """
+    models.register(("spacy", models.spacy_model), NLP())
+    models.register("wordnet", Wordnet)
@@ -0,0 +1,213 @@
+"""
+benchmark suite
+===============
+
+Times every hot path of optimus on a seeded synthetic corpus with the
+stand-in models: the cleaners, parsing, embedding, the clustering backends,
+the condition and selection of every selection tier, ``select`` and an
+end-to-end ``run``.
+
+Results are appended to a JSON-lines file together with the commit they
+were measured at, and every case is compared with the last result of a
+different commit on the same corpus, so regressions show up between
+commits.
+
+Run from the repository root with::
+
+    python -m benchmarks.suite [--lines 5000] [--only select] [--no-record]
+
+"""
+# stdlib
+import sys
+import json
+import time
+import argparse
+import datetime
+import subprocess
+
+# third party
+import numpy as np
+
+# project
+from benchmarks import standins
+from benchmarks.corpus import corpus
+from optimus.core import parse
+from optimus.core import cluster
+from optimus.core.embedding import fasttext
+from optimus.core.select import select, build
+from optimus.core.select import edits as ed
+from optimus.core.select import wordgrams as wg
+from optimus.core.select import chargrams as cg
+from optimus.core.select import hypernyms as hn
+from optimus.core.select import profile as pf
+from optimus.optimus import run
+
+tiers = {"edit": ed, "wordgram": wg, "chargram": cg, "hypernym": hn}
+
+
+def commit():
+    """
+    Short hash of the checked out commit, "unknown" outside of git
+    """
+    try:
+        command = ["git", "rev-parse", "--short", "HEAD"]
+        return subprocess.run(command, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def reset():
+    """
+    Forget everything memoised between cases
+    """
+    pf.clear()
+    hn.clear()
+
+
+def best(function, repeat):
+    """
+    Best wall time of a function over a number of runs
+
+    Parameters
+    ----------
+    function : function
+        zero argument function
+
+    repeat : int
+
+    Returns
+    -------
+    float
+        seconds
+    """
+    times = []
+    for _ in range(repeat):
+        reset()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def cases(lines, families, rows=3000, depth=10):
+    """
+    The benchmark cases on a corpus
+
+    Parameters
+    ----------
+    lines : list[str]
+
+    families : numpy.ndarray
+        the family of every line
+
+    rows : int
+        number of distinct lines the clustering backends are timed on
+
+    depth : float
+        depth the clusterings are cut at
+
+    Returns
+    -------
+    dict[str, function]
+        zero argument functions by case name
+    """
+    model = standins.Model()
+    cleaned = parse.cleaner().clean_batch(lines)
+    targets = list(parse.parse(cleaned))
+    embedding = np.stack(list(fasttext.embed(list(dict.fromkeys(cleaned)), model)))
+    embedding = embedding[:rows]
+
+    groups = {}
+    for text, family in zip(cleaned, families):
+        groups.setdefault(family, []).append(text)
+    groups = [group for group in groups.values() if len(group) > 1]
+
+    found = {
+        "clean.default_cleanerM": lambda: list(parse.default_cleanerM(lines)),
+        "clean.Cleaner": lambda: parse.Cleaner().clean_batch(lines),
+        "parse.parse": lambda: list(parse.parse(cleaned)),
+        "embed.embed": lambda: list(fasttext.embed(targets, model)),
+        "embed.Embedder": lambda: fasttext.Embedder(model)(targets),
+    }
+    for backend in cluster.backends:
+        found[f"cluster.{backend}"] = lambda backend=backend: cluster.cluster(
+            embedding, depth, backend=backend
+        )
+    for name, tier in tiers.items():
+        # like in ``select``, a selection only runs where its condition holds
+        chosen = [group for group in groups if tier.condition(group) > 0]
+        found[f"select.{name}.condition"] = lambda tier=tier: [
+            tier.condition(group) for group in groups
+        ]
+        found[f"select.{name}.selection"] = lambda tier=tier, chosen=chosen: [
+            tier.selection(group) for group in chosen
+        ]
+    clusters = np.unique(families, return_inverse=True)[1] + 1
+    found["select.build"] = lambda: list(build(cleaned, clusters))
+    found["select.select"] = lambda: list(select(cleaned, clusters))
+    found["run"] = lambda: run(lines, model)
+    return found
+
+
+def previous(records, record):
+    """
+    The last record of the same case and corpus from another commit
+    """
+    for old in reversed(records):
+        if (
+            old["case"] == record["case"]
+            and old["corpus"] == record["corpus"]
+            and old["commit"] != record["commit"]
+        ):
+            return old
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--vocabulary", type=int, default=2000)
+    parser.add_argument("--duplicates", type=float, default=0.5)
+    parser.add_argument("--sizes", choices=["zipf", "uniform"], default="zipf")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default="", help="only cases containing this")
+    parser.add_argument("--results", default="benchmarks/results.jsonl")
+    parser.add_argument("--no-record", dest="record", action="store_false")
+    args = parser.parse_args(arguments)
+
+    standins.install()
+    settings = dict(
+        lines=args.lines,
+        vocabulary=args.vocabulary,
+        duplicates=args.duplicates,
+        sizes=args.sizes,
+        seed=args.seed,
+    )
+    lines, families = corpus(**settings)
+
+    try:
+        with open(args.results) as handle:
+            records = [json.loads(line) for line in handle]
+    except FileNotFoundError:
+        records = []
+
+    date = datetime.datetime.now().isoformat(timespec="seconds")
+    print(f"{'case':<28} {'seconds':>9} {'previous':>9} {'ratio':>6}")
+    for case, function in cases(lines, families).items():
+        if args.only not in case:
+            continue
+        seconds = best(function, args.repeat)
+        record = dict(
+            case=case, seconds=seconds, corpus=settings, commit=commit(), date=date
+        )
+        old = previous(records, record)
+        ratio = old and f" {old['seconds']:>9.4f} {seconds / old['seconds']:>6.2f}"
+        print(f"{case:<28} {seconds:>9.4f}{ratio or ''}")
+
+        if args.record:
+            with open(args.results, "a") as handle:
+                handle.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
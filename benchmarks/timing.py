@@ -0,0 +1,43 @@
+"""
+timing
+======
+
+Wall time and peak memory of a call, shared by the benchmarks.
+
+"""
+# stdlib
+import time
+import tracemalloc
+
+
+def measure(function, *args, memory=True):
+    """
+    Call a function once and measure it
+
+    Parameters
+    ----------
+    function : function
+
+    *args
+        passed on to the function
+
+    memory : bool
+        trace the peak of the memory allocated by python (and numpy)
+        during the call, which slows pure python code down
+
+    Returns
+    -------
+    tuple
+        the result, the seconds it took and the peak memory in MiB
+        (``None`` without ``memory``)
+    """
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    if not memory:
+        return result, elapsed, None
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
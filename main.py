@@ -1,11 +1,20 @@
+# stdlib
+import logging
+
 # third party
 import fastText as ft
 
 # project
 from optimus.optimus import run
+from optimus.core import models
 from optimus.core.select import select
 
-print("[INFO] Loading fastText model")
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+logging.info("Loading fastText model")
 model = ft.load_model("wiki.en.bin")
 
+logging.info("Loading spacy and wordnet models")
+models.warmup()
+
 results = run("tests/resources/example.txt", model, stepsize=3)
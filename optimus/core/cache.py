@@ -0,0 +1,184 @@
+"""
+parse cache
+===========
+
+Persistent cache of parse results, so lines that come back run after run
+are only sent through spacy once.
+
+The cache is an SQLite file mapping cleaned texts to what
+``optimus.core.parse.parse`` gives for them. Entries live under a
+namespace made of the spacy model name and version and a hash of the regex
+table, so changing either starts from an empty cache instead of serving
+stale results.
+
+"""
+# stdlib
+import json
+import sqlite3
+import hashlib
+
+# project
+from optimus.core import models
+from optimus.core import parse as ps
+
+# number of keys per SELECT, below SQLite's host parameter limit
+batch = 500
+
+
+def version(name):
+    """
+    Version of an installed spacy model package, without loading it
+
+    Parameters
+    ----------
+    name : str
+        name of the spacy model
+
+    Returns
+    -------
+    str
+        empty if the model is not an installed package
+    """
+    try:
+        import spacy
+
+        return spacy.util.get_package_version(name) or ""
+    except ImportError:
+        return ""
+
+
+def namespace(name=models.spacy_model, regex_dict=None):
+    """
+    Identify the parser a cache entry comes from
+
+    Parameters
+    ----------
+    name : str
+        name of the spacy model
+
+    regex_dict : dict
+        regex table of the cleaner, the packaged one by default
+
+    Returns
+    -------
+    str
+        hex digest
+    """
+    regex_dict = models.regexes() if regex_dict is None else regex_dict
+    digest = hashlib.sha1(f"{name}=={version(name)}".encode())
+    digest.update(json.dumps(list(regex_dict.items())).encode())
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    SQLite backed cache from cleaned text to parse result
+
+    Parameters
+    ----------
+    path : str
+        the SQLite file, created if it does not exist
+
+    name : str
+        name of the spacy model
+
+    regex_dict : dict
+        regex table of the cleaner, the packaged one by default
+    """
+
+    def __init__(self, path, name=models.spacy_model, regex_dict=None):
+        self.namespace = namespace(name, regex_dict)
+        self.hits, self.misses = 0, 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS parses "
+            "(namespace TEXT, text TEXT, target TEXT, PRIMARY KEY (namespace, text))"
+        )
+
+    def get(self, texts):
+        """
+        Look texts up in bulk
+
+        Parameters
+        ----------
+        texts : list[str]
+
+        Returns
+        -------
+        dict[str, str]
+            the parse results of the texts that are cached
+        """
+        texts, found = list(dict.fromkeys(texts)), {}
+        for i in range(0, len(texts), batch):
+            keys = texts[i : i + batch]
+            rows = self.connection.execute(
+                "SELECT text, target FROM parses WHERE namespace = ? "
+                f"AND text IN ({', '.join('?' * len(keys))})",
+                [self.namespace, *keys],
+            )
+            found.update(rows)
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        return found
+
+    def put(self, results):
+        """
+        Store parse results in bulk
+
+        Parameters
+        ----------
+        results : dict[str, str]
+            cleaned text -> parse result
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO parses VALUES (?, ?, ?)",
+                ((self.namespace, text, target) for text, target in results.items()),
+            )
+
+    def parse(self, texts, batch_size=1000, n_process=1):
+        """
+        Same as ``optimus.core.parse.parse``, but only the distinct texts
+        that are not cached are parsed (in one batch) and then cached
+
+        Parameters
+        ----------
+        texts : list[str]
+            cleaned texts
+
+        batch_size : int
+            see ``optimus.core.parse.parse``
+
+        n_process : int
+            see ``optimus.core.parse.parse``
+
+        Returns
+        -------
+        list[str]
+        """
+        found = self.get(texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            parsed = ps.parse(missing, batch_size=batch_size, n_process=n_process)
+            results = dict(zip(missing, parsed))
+            self.put(results)
+            found.update(results)
+        return [found[text] for text in texts]
+
+    def prune(self, size):
+        """
+        Drop all but the ``size`` most recently stored entries
+
+        Parameters
+        ----------
+        size : int
+        """
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM parses WHERE rowid <= "
+                "(SELECT rowid FROM parses ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                (size,),
+            )
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,114 @@
+"""
+checkpoints
+===========
+
+Save the stages of a run (parsed targets, embeddings, linkage, labels of
+every depth) as they complete, so a run that stops half way can carry on
+from the last completed stage.
+
+A checkpoint lives in a directory named after a hash of the inputs and the
+parameters of the run, so a run only ever resumes from a checkpoint of the
+same data, models and parameters. Arrays are saved as ``.npy`` files and
+memory-mapped when loaded back.
+
+"""
+# stdlib
+import os
+import json
+import hashlib
+
+# third party
+import numpy as np
+
+
+def digest(data, *inputs, **params):
+    """
+    Hash the input data of a run together with anything else it depends on
+
+    Parameters
+    ----------
+    data : list[str] | str
+        list of strings or a string path to a text file
+
+    *inputs : str
+        other identifiers (e.g. model fingerprints)
+
+    **params
+        parameters of the run, must be JSON serialisable
+
+    Returns
+    -------
+    str
+        hex digest
+    """
+    sha = hashlib.sha1()
+    if isinstance(data, str):
+        with open(data, "rb") as handle:
+            for block in iter(lambda: handle.read(2 ** 20), b""):
+                sha.update(block)
+    else:
+        for line in data:
+            sha.update(line.encode("utf-8") + b"\n")
+    sha.update(json.dumps([inputs, sorted(params.items())]).encode())
+    return sha.hexdigest()
+
+
+class Checkpoint:
+    """
+    Directory of saved stages, ``.npy`` names are arrays and everything else
+    is JSON. Every file is written to a temporary name and moved in place,
+    so a stage is either saved completely or not at all.
+
+    Parameters
+    ----------
+    path : str
+        directory holding the checkpoints of every run
+
+    key : str
+        the ``digest`` of the run
+    """
+
+    def __init__(self, path, key):
+        self.path = os.path.join(path, key)
+        os.makedirs(self.path, exist_ok=True)
+
+    def has(self, name):
+        return os.path.exists(os.path.join(self.path, name))
+
+    def save(self, name, value):
+        """
+        Save a stage
+
+        Parameters
+        ----------
+        name : str
+            file name, ``.npy`` for arrays
+
+        value : numpy.ndarray | object
+            array or JSON serialisable value
+        """
+        path = os.path.join(self.path, name)
+        with open(path + ".tmp", "wb") as handle:
+            if name.endswith(".npy"):
+                np.save(handle, np.asarray(value))
+            else:
+                handle.write(json.dumps(value).encode("utf-8"))
+        os.replace(path + ".tmp", path)
+
+    def load(self, name):
+        """
+        Load a saved stage, arrays are memory-mapped
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        numpy.ndarray | object
+        """
+        path = os.path.join(self.path, name)
+        if name.endswith(".npy"):
+            return np.load(path, mmap_mode="r")
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
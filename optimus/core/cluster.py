@@ -5,20 +5,180 @@ import toolz as fp
 import numpy as np
 import scipy.cluster.hierarchy as clus
 
+from scipy.spatial import distance
 
-def z(embedding):
+
+def z(embedding, weights=None):
     """
     Retrieve a cluster hierarchy array
 
-    Uses ``scipy.cluster.hierarchy.linkage`` and ``ward`` linkage
+    Uses ``scipy.cluster.hierarchy.linkage`` and ``ward`` linkage,
+    or ``ward`` when the rows carry multiplicity weights
 
     Parameters
     ----------
     embeddings : numpy.ndarray or list[float]
         the embeddings to be clustered by
-   
+
+    weights : numpy.ndarray
+        number of observations each row stands for (default: 1 each)
+
+    Returns
+    -------
+    numpy.ndarray
+        linkage matrix
     """
-    return clus.linkage(embedding, "ward")
+    if len(embedding) == 1:
+        return np.zeros((0, 4))
+    if weights is None or np.all(np.asarray(weights) == 1):
+        return clus.linkage(embedding, "ward")
+    return ward(embedding, weights)
+
+
+def ward(embedding, weights):
+    """
+    Weighted Ward linkage
+
+    A row with weight k is treated as k identical observations, so the
+    result is the Ward hierarchy of the expanded data once its duplicates
+    have been merged at height 0. Uses the nearest neighbour chain
+    algorithm on condensed squared distances with Lance-Williams updates,
+    the same O(n^2) memory as ``scipy.cluster.hierarchy.linkage`` and
+    O(n) work per step of the chain.
+
+    Parameters
+    ----------
+    embedding : numpy.ndarray
+        the (deduplicated) embeddings to be clustered
+
+    weights : numpy.ndarray
+        number of observations each row stands for
+
+    Returns
+    -------
+    numpy.ndarray
+        linkage matrix in the ``scipy.cluster.hierarchy`` format
+    """
+    x = np.asarray(embedding, dtype=np.float64)
+    size = np.asarray(weights, dtype=np.float64).copy()
+    n = len(x)
+
+    # squared ward distance between weighted points, scaled a row at a time
+    d = distance.pdist(x, "sqeuclidean")
+    start = 0
+    for i in range(n - 1):
+        rest = size[i + 1 :]
+        d[start : start + n - i - 1] *= 2 * size[i] * rest / (size[i] + rest)
+        start += n - i - 1
+
+    rows = np.arange(n)
+    offsets = n * rows - rows * (rows + 1) // 2 - rows - 1
+    active = np.ones(n, dtype=bool)
+    merges, chain = [], []
+    for _ in range(n - 1):
+        while True:
+            if not chain:
+                chain.append(int(np.argmax(active)))
+            a = chain[-1]
+            row = np.where(active, d[condensed(a, offsets)], np.inf)
+            row[a] = np.inf
+            b = int(np.argmin(row))
+            # prefer the previous element of the chain on ties
+            if len(chain) > 1 and row[chain[-2]] <= row[b]:
+                b = chain[-2]
+            if len(chain) > 1 and b == chain[-2]:
+                break
+            chain.append(b)
+        chain = chain[:-2]
+
+        # merge b into a (lance-williams update for ward)
+        ia, ib = condensed(a, offsets), condensed(b, offsets)
+        dist, na, nb = d[ia[b]], size[a], size[b]
+        active[b] = False
+        others = active.copy()
+        others[a] = False
+        nk = size[others]
+        ia, ib = ia[others], ib[others]
+        d[ia] = ((nk + na) * d[ia] + (nk + nb) * d[ib] - nk * dist) / (na + nb + nk)
+        size[a] = na + nb
+        merges.append((a, b, np.sqrt(max(dist, 0.0))))
+
+    return relabel(merges, n)
+
+
+def condensed(i, offsets):
+    """
+    Positions of the distances between row ``i`` and every row in a
+    condensed distance matrix (see ``scipy.spatial.distance.squareform``),
+    the position for ``i`` itself is a placeholder
+
+    Parameters
+    ----------
+    i : int
+
+    offsets : numpy.ndarray
+        ``n*j - j*(j+1)//2 - j - 1`` for every row j of the n rows
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    n = len(offsets)
+    index = np.empty(n, dtype=np.intp)
+    index[:i] = offsets[:i] + i
+    index[i] = 0
+    index[i + 1 :] = offsets[i] + np.arange(i + 1, n)
+    return index
+
+
+def relabel(merges, n):
+    """
+    Turn unordered merges into a ``scipy.cluster.hierarchy`` linkage matrix
+
+    Parameters
+    ----------
+    merges : list[tuple[int, int, float]]
+        (kept row, merged row, distance) in the order they happened,
+        a cluster is referred to by the row that was kept
+
+    n : int
+        number of rows
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    links = np.zeros((len(merges), 4))
+    label, size = np.arange(n), np.ones(n)
+    order = sorted(range(len(merges)), key=lambda i: merges[i][2])
+    for i, j in enumerate(order):
+        a, b, dist = merges[j]
+        size[a] += size[b]
+        links[i] = min(label[a], label[b]), max(label[a], label[b]), dist, size[a]
+        label[a] = n + i
+    return links
+
+
+def unique(embedding, weights=None):
+    """
+    Deduplicate the rows of an embedding
+
+    Parameters
+    ----------
+    embedding : numpy.ndarray or list[list[float]]
+
+    weights : numpy.ndarray
+        number of observations each row stands for (default: 1 each)
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+        the unique rows, the index of the unique row for every input
+        row and the total weight of each unique row
+    """
+    uniques, inverse = np.unique(np.asarray(embedding), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    return uniques, inverse, np.bincount(inverse, weights=weights)
 
 
 def fetch(depth, links):
@@ -38,10 +198,306 @@ def fetch(depth, links):
     numpy.ndarray
        
     """
+    if not len(links):  # a single observation
+        return np.ones(1, dtype=np.int32)
     return clus.fcluster(links, depth, criterion="distance")
 
 
-def cluster(embedding, depth):
+def exact(embedding, weights=None):
+    """
+    The default backend: exact (weighted) ward linkage, see ``z``
+
+    Parameters
+    ----------
+    embedding : numpy.ndarray
+
+    weights : numpy.ndarray
+        number of observations each row stands for (default: 1 each)
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        linkage matrix and the leaf of the linkage for every row
+    """
+    return z(embedding, weights), np.arange(len(embedding))
+
+
+def nearest(xs, centroids, chunksize=4096):
+    """
+    Index of the nearest centroid of every row, computed in chunks
+    so that memory stays bounded
+
+    Parameters
+    ----------
+    xs : numpy.ndarray
+
+    centroids : numpy.ndarray
+
+    chunksize : int
+        number of rows to compare against the centroids at a time
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    norms = np.einsum("ij,ij->i", centroids, centroids)
+    return np.concatenate(
+        [
+            np.argmin(norms - 2 * xs[i : i + chunksize] @ centroids.T, axis=1)
+            for i in range(0, len(xs), chunksize)
+        ]
+        or [np.zeros(0, dtype=np.intp)]
+    )
+
+
+def totals(index, xs, size, weights=None):
+    """
+    Sum the (weighted) rows of ``xs`` by group, ``np.add.at`` without
+    the per element overhead
+
+    Parameters
+    ----------
+    index : numpy.ndarray
+        group of every row
+
+    xs : numpy.ndarray
+
+    size : int
+        number of groups
+
+    weights : numpy.ndarray
+        weight of every row (default: 1 each)
+
+    Returns
+    -------
+    numpy.ndarray
+        array of shape (size, xs.shape[1])
+    """
+    w = 1 if weights is None else weights
+    return np.stack(
+        [np.bincount(index, weights=column * w, minlength=size) for column in xs.T],
+        axis=1,
+    )
+
+
+def minibatch(
+    embedding, weights=None, centroids=1024, batch=1024, iterations=50, seed=0
+):
+    """
+    Approximate, memory bounded backend: mini-batch k-means
+    pre-clustering followed by a weighted ward linkage of the centroids.
+
+    The ward distance between two weighted centroids is the ward distance
+    between the groups of rows they stand for, so the merge heights (and
+    with them the ``depth`` cut offs) are on the same scale as the exact
+    backend. Rows that share a centroid always share a cluster. Memory is
+    O(n*d + batch*centroids + centroids^2) instead of O(n^2).
+
+    Parameters
+    ----------
+    embedding : numpy.ndarray
+
+    weights : numpy.ndarray
+        number of observations each row stands for (default: 1 each)
+
+    centroids : int
+        number of pre-clusters
+
+    batch : int
+        rows per mini-batch
+
+    iterations : int
+        number of mini-batches
+
+    seed : int
+        seed for the random number generator
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        linkage matrix and the leaf of the linkage for every row
+    """
+    xs = np.asarray(embedding, dtype=np.float64)
+    weights = np.ones(len(xs)) if weights is None else np.asarray(weights, float)
+    if len(xs) <= centroids:
+        return exact(xs, weights)
+
+    rng = np.random.RandomState(seed)
+    p = weights / weights.sum()
+    centres = xs[rng.choice(len(xs), centroids, replace=False, p=p)]
+    counts = np.zeros(centroids)
+    for _ in range(iterations):
+        sample = rng.choice(len(xs), min(batch, len(xs)), replace=False, p=p)
+        assigned = nearest(xs[sample], centres)
+        mass = np.bincount(assigned, minlength=centroids)
+        total = totals(assigned, xs[sample], centroids)
+        counts += mass
+        moved = mass > 0
+        step = total[moved] - mass[moved, None] * centres[moved]
+        centres[moved] += step / counts[moved, None]
+
+    # final assignment, centroids become the weighted means of their rows
+    assigned = nearest(xs, centres)
+    used, leaves = np.unique(assigned, return_inverse=True)
+    mass = np.bincount(leaves, weights=weights)
+    total = totals(leaves, xs, len(used), weights)
+    return ward(total / mass[:, None], mass), leaves
+
+
+def local(embedding, weights, resolution):
+    """
+    Pre-cluster a shard: its exact (weighted) ward linkage cut at
+    ``resolution``
+
+    Parameters
+    ----------
+    embedding : numpy.ndarray
+
+    weights : numpy.ndarray
+        number of observations each row stands for
+
+    resolution : float
+        depth the shard is cut at
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+        the centroid and weight of every local cluster and the local
+        cluster of every row
+    """
+    links, leaves = exact(embedding, weights)
+    clusters = cut(resolution, links, leaves) - 1
+    mass = np.bincount(clusters, weights=weights)
+    return (
+        totals(clusters, embedding, len(mass), weights) / mass[:, None],
+        mass,
+        clusters,
+    )
+
+
+def sharded(embedding, weights=None, shards=4, resolution=0.5, executor=None, seed=0):
+    """
+    Sharded backend: the rows are split into shards by a hash of their
+    embedding, every shard is clustered on its own and the centroids of
+    the shards' clusters are merged with a final weighted ward linkage.
+
+    The hash is the side of a few random hyperplanes through the mean a row
+    is on, so nearby rows tend to share a shard. Every shard is cut at
+    ``resolution`` and, like with ``minibatch``, the ward distances between
+    the weighted centroids are the distances between the groups of rows
+    they stand for, so every depth above ``resolution`` cuts the merged
+    hierarchy on the same scale as the exact backend. With a resolution
+    below the lowest merge height the result is the exact hierarchy.
+
+    Parameters
+    ----------
+    embedding : numpy.ndarray
+
+    weights : numpy.ndarray
+        number of observations each row stands for (default: 1 each)
+
+    shards : int
+        number of shards
+
+    resolution : float
+        depth every shard is cut at before merging, the lowest depth the
+        hierarchy is meant to be cut at
+
+    executor : concurrent.futures.Executor
+        executor to cluster the shards with, by default one after the other
+
+    seed : int
+        seed for the hyperplanes
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        linkage matrix and the leaf of the linkage for every row
+    """
+    xs = np.asarray(embedding, dtype=np.float64)
+    weights = np.ones(len(xs)) if weights is None else np.asarray(weights, float)
+    if shards <= 1 or len(xs) <= shards:
+        return exact(xs, weights)
+
+    bits = int(np.ceil(np.log2(shards)))
+    planes = np.random.RandomState(seed).normal(size=(xs.shape[1], bits))
+    hashes = ((xs - xs.mean(axis=0)) @ planes > 0) @ (2 ** np.arange(bits))
+    parts = [np.flatnonzero(hashes % shards == i) for i in range(shards)]
+    parts = [part for part in parts if len(part)]
+
+    mapper = map if executor is None else executor.map
+    results = list(
+        mapper(
+            local,
+            [xs[part] for part in parts],
+            [weights[part] for part in parts],
+            [resolution] * len(parts),
+        )
+    )
+
+    leaves, offset = np.empty(len(xs), dtype=np.intp), 0
+    for part, (_, mass, clusters) in zip(parts, results):
+        leaves[part] = clusters + offset
+        offset += len(mass)
+    centroids = np.concatenate([centroids for centroids, _, _ in results])
+    mass = np.concatenate([mass for _, mass, _ in results])
+    return z(centroids, mass), leaves
+
+
+# available clustering backends, backend(embedding, weights, **options)
+backends = {"ward": exact, "minibatch": minibatch, "sharded": sharded}
+
+
+def hierarchy(embedding, weights=None, backend="ward", **options):
+    """
+    Build the cluster hierarchy with a clustering backend
+
+    Parameters
+    ----------
+    embedding : numpy.ndarray or list[list[float]]
+
+    weights : numpy.ndarray
+        number of observations each row stands for (default: 1 each)
+
+    backend : str or function
+        a name from ``backends`` or a function with the same signature
+        returning (linkage matrix, leaf for every row)
+
+    **options
+        passed on to the backend
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        linkage matrix and the leaf of the linkage for every row
+    """
+    backend = backend if callable(backend) else backends[backend]
+    return backend(np.asarray(embedding), weights, **options)
+
+
+def cut(depth, links, leaves):
+    """
+    Cluster numbers for every row of a hierarchy at a depth
+
+    Parameters
+    ----------
+    depth : float
+        the distance/depth paramater for the optimus cut off
+
+    links : numpy.ndarray
+        linkage matrix
+
+    leaves : numpy.ndarray
+        the leaf of the linkage for every row
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    return fetch(depth, links)[leaves]
+
+
+def cluster(embedding, depth, dedupe=False, backend="ward", **options):
     """
     A clustering pipe. It requires a set of embeddings and a depth
     to return cluster numbers (needed for the hierarchical clustering cutoff)
@@ -54,9 +510,54 @@ def cluster(embedding, depth):
     depth : float
         float to signify the distance cut off point
 
+    dedupe : bool
+        cluster the unique rows only, weighted by how often they occur,
+        and map the cluster numbers back to every row. Identical rows
+        always end up in the same cluster and the cost scales with the
+        number of unique rows.
+
+    backend : str or function
+        clustering backend, see ``hierarchy``
+
+    **options
+        passed on to the backend
+
     Returns
     -------
     numpy.ndarray
         cluster numbers for the original input
     """
-    return fetch(depth, z(embedding))
+    if dedupe:
+        uniques, inverse, counts = unique(embedding)
+        links, leaves = hierarchy(uniques, counts, backend, **options)
+        return cut(depth, links, leaves[inverse])
+    return cut(depth, *hierarchy(embedding, backend=backend, **options))
+
+
+def sweep(embedding, depths, backend="ward", **options):
+    """
+    Cluster numbers for several depths. The hierarchy is computed once
+    and cut at every depth, which is the same as calling ``cluster`` for
+    each depth.
+
+    Parameters
+    ----------
+    embedding : list[list[float]]
+        a list of lists of floats. It should also accept a numpy.ndarray
+
+    depths : list[float]
+        distance cut off points
+
+    backend : str or function
+        clustering backend, see ``hierarchy``
+
+    **options
+        passed on to the backend
+
+    Returns
+    -------
+    generator[numpy.ndarray]
+        cluster numbers for the original input, per depth
+    """
+    links, leaves = hierarchy(embedding, backend=backend, **options)
+    return (cut(depth, links, leaves) for depth in depths)
@@ -6,10 +6,20 @@ Embedding functionality to go from STR to [FLOAT] using fastText
 
 """
 # stdlib
-import toolz as fp
+import os
+import json
+import hashlib
+
+from collections import OrderedDict
 
 # third party
-import toml
+import numpy as np
+
+# project
+from optimus.utils import lazy
+
+# words used to fingerprint a model by the vectors it gives them
+probes = ("the", "optimus", "chocolate", "pizza", "zzyzx")
 
 
 def embed(texts, model):
@@ -32,3 +42,186 @@ def embed(texts, model):
     map
     """
     return map(model.get_word_vector, texts)
+
+
+def fingerprint(model):
+    """
+    Identify a model by its dimension and the vectors it produces for a
+    fixed set of probe words. Models that expose a ``fingerprint``
+    attribute (e.g. an embedding store) use that instead.
+
+    Parameters
+    ----------
+    model : fastText.FastText._FastText
+
+    Returns
+    -------
+    str
+        hex digest
+    """
+    if getattr(model, "fingerprint", None):
+        return model.fingerprint
+    vectors = np.stack([model.get_word_vector(word) for word in probes])
+    digest = hashlib.sha1(str(model.get_dimension()).encode())
+    digest.update(vectors.astype(np.float32).tobytes())
+    return digest.hexdigest()
+
+
+class Embedder:
+    """
+    Batch embedding engine around a fastText model.
+
+    The texts of a batch are deduplicated, each unique text is embedded
+    once and the rows are scattered back to the input order. Vectors are
+    kept in an in-memory LRU cache and, optionally, in an on-disk cache
+    that is memory-mapped and keyed by the model fingerprint, so repeated
+    depths and repeated runs do not embed the same text twice.
+
+    Only one process should write to a given on-disk cache at a time.
+
+    Parameters
+    ----------
+    model : fastText.FastText._FastText
+        loaded fast text model (anything with ``get_word_vector``
+        and ``get_dimension``)
+
+    maxsize : int
+        number of vectors to keep in the in-memory cache
+
+    path : str
+        directory for the on-disk cache, ``None`` to disable it
+    """
+
+    def __init__(self, model, maxsize=2 ** 16, path=None):
+        self.model = model
+        self.dimension = model.get_dimension()
+        self.maxsize = maxsize
+        self.lru = OrderedDict()
+        self.path = path and os.path.join(path, self.fingerprint)
+        self.keys = {}
+        self.vectors = np.empty((0, self.dimension), dtype=np.float32)
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            self.load()
+
+    @lazy
+    def fingerprint(self):
+        """
+        Fingerprint of the model, so an Embedder can stand in for its model
+        """
+        return fingerprint(self.model)
+
+    def load(self):
+        """
+        Read the keys of the on-disk cache and memory-map its vectors.
+
+        ``store`` appends the vectors before the keys, so an interrupted
+        ``store`` leaves vectors without keys (or a partly written key).
+        Both files are cut back to the rows they have in common.
+        """
+        keys = os.path.join(self.path, "keys.jsonl")
+        vectors = os.path.join(self.path, "vectors.f32")
+        if not os.path.exists(keys):
+            return
+        size = 4 * self.dimension
+        rows = os.path.getsize(vectors) // size if os.path.exists(vectors) else 0
+
+        self.keys, end = {}, 0
+        with open(keys, "rb") as handle:
+            for i, line in enumerate(handle):
+                if i == rows or not line.endswith(b"\n"):
+                    break
+                self.keys[json.loads(line)] = i
+                end += len(line)
+        os.truncate(keys, end)
+        with open(vectors, "ab") as handle:
+            handle.truncate(len(self.keys) * size)
+        self.remap()
+
+    def remap(self):
+        """
+        Memory-map the rows of the vector file that have keys
+        """
+        if self.keys:
+            self.vectors = np.memmap(
+                os.path.join(self.path, "vectors.f32"),
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.keys), self.dimension),
+            )
+
+    def store(self, texts, vectors):
+        """
+        Append newly embedded texts to the on-disk cache
+
+        Parameters
+        ----------
+        texts : list[str]
+            texts that are not in the cache yet
+
+        vectors : numpy.ndarray
+            float32 array with a row per text
+        """
+        with open(os.path.join(self.path, "vectors.f32"), "ab") as handle:
+            handle.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(os.path.join(self.path, "keys.jsonl"), "a") as handle:
+            handle.writelines(json.dumps(text) + "\n" for text in texts)
+        for text in texts:
+            self.keys[text] = len(self.keys)
+        self.remap()
+
+    def remember(self, text, vector):
+        self.lru[text] = vector
+        if len(self.lru) > self.maxsize:
+            self.lru.popitem(last=False)
+
+    def lookup(self, texts):
+        """
+        Embed unique texts, going through the caches first
+
+        Parameters
+        ----------
+        texts : list[str]
+            texts without duplicates
+
+        Returns
+        -------
+        numpy.ndarray
+            float32 array of shape (len(texts), dimension)
+        """
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        missing = []
+        for i, text in enumerate(texts):
+            if text in self.lru:
+                self.lru.move_to_end(text)
+                vectors[i] = self.lru[text]
+            elif text in self.keys:
+                vectors[i] = self.vectors[self.keys[text]]
+                self.remember(text, vectors[i].copy())
+            else:
+                missing.append(i)
+
+        for i in missing:
+            vectors[i] = self.model.get_word_vector(texts[i])
+            self.remember(texts[i], vectors[i].copy())
+
+        if self.path and missing:
+            self.store([texts[i] for i in missing], vectors[missing])
+        return vectors
+
+    def __call__(self, texts):
+        """
+        Embed a list of texts
+
+        Parameters
+        ----------
+        texts : list[str]
+
+        Returns
+        -------
+        numpy.ndarray
+            contiguous float32 array with a row per text
+        """
+        index = {}
+        inverse = [index.setdefault(text, len(index)) for text in texts]
+        return self.lookup(list(index))[np.asarray(inverse, dtype=np.intp)]
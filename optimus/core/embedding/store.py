@@ -0,0 +1,233 @@
+"""
+memory-mapped embedding store
+=============================
+
+Export the vectors of a fastText model once into plain ``.npy`` files and
+share them between processes through memory-mapping, instead of loading
+the full ``.bin`` model into every process.
+
+A store is exported in one of two modes:
+
+- ``subwords``: the full input matrix (vocabulary and subword buckets) and a
+  sorted vocabulary. Vectors are rebuilt exactly like fastText does, so
+  out of vocabulary words still get subword vectors.
+- ``words``: precomputed vectors for a given list of words only (e.g. the
+  keywords of a corpus). Anything else gets a zero vector.
+
+"""
+# stdlib
+import os
+import json
+
+# third party
+import numpy as np
+
+# project
+from optimus.core import models
+from optimus.core.embedding.fasttext import fingerprint
+
+# fastText markers
+bow, eow, eos = "<", ">", "</s>"
+
+
+def hash_(data):
+    """
+    The 32 bit FNV-1a hash fastText uses for subword buckets
+    (bytes are sign extended like a C ``int8_t``)
+
+    Parameters
+    ----------
+    data : bytes
+
+    Returns
+    -------
+    int
+    """
+    h = 2166136261
+    for byte in data:
+        h = ((h ^ (byte | 0xFFFFFF00 if byte & 0x80 else byte)) * 16777619) & 0xFFFFFFFF
+    return h
+
+
+def subwords(word, minn, maxn, bucket):
+    """
+    Bucket numbers of the character ngrams of a word, same as
+    ``Dictionary::computeSubwords`` in fastText
+
+    Parameters
+    ----------
+    word : str
+
+    minn : int
+        min length of the ngrams
+
+    maxn : int
+        max length of the ngrams
+
+    bucket : int
+        number of buckets
+
+    Returns
+    -------
+    list[int]
+        buckets, to be offset by the vocabulary size
+    """
+    data = (bow + word + eow).encode("utf-8")
+    ngrams = []
+    for i in range(len(data)):
+        if data[i] & 0xC0 == 0x80:  # utf-8 continuation byte
+            continue
+        j, n = i, 1
+        while j < len(data) and n <= maxn:
+            j += 1
+            while j < len(data) and data[j] & 0xC0 == 0x80:
+                j += 1
+            if n >= minn and not (n == 1 and (i == 0 or j == len(data))):
+                ngrams.append(hash_(data[i:j]) % bucket)
+            n += 1
+    return ngrams
+
+
+def export(model, path, words=None):
+    """
+    Export a fastText model into a store directory
+
+    Parameters
+    ----------
+    model : fastText.FastText._FastText
+        loaded fast text model
+
+    path : str
+        directory to write the store to
+
+    words : list[str]
+        if given, only export precomputed vectors for these words
+        (``words`` mode), otherwise export the full input matrix
+        (``subwords`` mode)
+    """
+    os.makedirs(path, exist_ok=True)
+    meta = {"dimension": model.get_dimension(), "fingerprint": fingerprint(model)}
+
+    if words is None:
+        args = model.f.getArgs()
+        vocabulary = model.get_words()
+        matrix = model.get_input_matrix()
+        meta.update(
+            mode="subwords",
+            minn=args.minn,
+            maxn=args.maxn,
+            bucket=args.bucket,
+            nwords=len(vocabulary),
+        )
+    else:
+        vocabulary = list(dict.fromkeys(words))
+        matrix = np.stack([model.get_word_vector(word) for word in vocabulary])
+        meta.update(mode="words")
+
+    keys = np.array([word.encode("utf-8") for word in vocabulary])
+    order = np.argsort(keys, kind="stable")
+    np.save(os.path.join(path, "vocab.npy"), keys[order])
+    np.save(os.path.join(path, "ids.npy"), order.astype(np.int32))
+    np.save(os.path.join(path, "matrix.npy"), np.asarray(matrix, dtype=np.float32))
+    with open(os.path.join(path, "meta.json"), "w") as handle:
+        json.dump(meta, handle)
+
+
+class Store:
+    """
+    Read only, memory-mapped embedding store that can stand in for a
+    fastText model (``get_word_vector``, ``get_dimension``)
+
+    The arrays are memory-mapped, so processes using the same store
+    share its pages instead of holding their own copy.
+
+    Parameters
+    ----------
+    path : str
+        directory written by ``export``
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as handle:
+            self.meta = json.load(handle)
+        self.fingerprint = self.meta["fingerprint"]
+        self.vocab = np.load(os.path.join(path, "vocab.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.matrix = np.load(os.path.join(path, "matrix.npy"), mmap_mode="r")
+
+    def get_dimension(self):
+        return self.meta["dimension"]
+
+    def get_word_id(self, word):
+        """
+        Vocabulary id of a word (binary search on the sorted vocabulary)
+
+        Parameters
+        ----------
+        word : str
+
+        Returns
+        -------
+        int
+            -1 if the word is not in the vocabulary
+        """
+        key = word.encode("utf-8")
+        i = np.searchsorted(self.vocab, key)
+        return int(self.ids[i]) if i < len(self.vocab) and self.vocab[i] == key else -1
+
+    def get_word_vector(self, word):
+        """
+        Vector of a word, same as ``model.get_word_vector``
+
+        Parameters
+        ----------
+        word : str
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        wid = self.get_word_id(word)
+        rows = [wid] if wid >= 0 else []
+        if self.meta["mode"] == "subwords" and word != eos:
+            meta = self.meta
+            ngrams = subwords(word, meta["minn"], meta["maxn"], meta["bucket"])
+            rows += [meta["nwords"] + h for h in ngrams]
+        if not rows:
+            return np.zeros(self.get_dimension(), dtype=np.float32)
+        return self.matrix[rows].mean(axis=0, dtype=np.float32)
+
+
+def load(path):
+    """
+    The store at ``path``, opened once per process
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    Store
+    """
+    return models.fetch(("store", os.path.abspath(path)), lambda: Store(path))
+
+
+def embed(texts, store):
+    """
+    Embedding of a list of texts through an embedding store,
+    same contract as ``optimus.core.embedding.fasttext.embed``
+
+    Parameters
+    ----------
+    texts : list[str]
+        the texts to be embedded
+
+    store : Store
+        embedding store (see ``load``)
+
+    Returns
+    -------
+    map
+    """
+    return map(store.get_word_vector, texts)
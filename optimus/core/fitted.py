@@ -0,0 +1,222 @@
+"""
+fitted hierarchies
+==================
+
+What a run learnt at every depth, kept so new lines can be labelled
+without clustering everything again.
+
+For every depth a fitted hierarchy holds the centroid of every cluster
+(the mean embedding of its targets, weighted by how many lines they stand
+for), how many lines it holds and the label selection chose for it. A new
+line is labelled by walking the depths like ``run`` does: its current
+target is embedded, goes to the nearest centroid and takes that cluster's
+label as its target for the next depth.
+
+A new line is outside the fitted clusters when the ward distance between
+it and its nearest cluster at the first depth is above that depth, i.e.
+when clustering again would not have merged it into that cluster. The
+share of such lines measures how far new data has drifted.
+
+"""
+# stdlib
+import os
+
+# third party
+import numpy as np
+
+# project
+from optimus.core.checkpoint import Checkpoint
+from optimus.core.cluster import nearest, totals
+from optimus.utils import intern
+
+# arrays saved for every depth
+parts = ("centroids", "sizes", "labels")
+
+
+class Fitted:
+    """
+    Cluster centroids, sizes and labels of every depth of a run
+
+    Parameters
+    ----------
+    strings : list[str]
+        the string table the label codes refer to
+
+    fingerprint : str
+        fingerprint of the embedding model
+        (see optimus.core.embedding.fasttext.fingerprint)
+
+    Attributes
+    ----------
+    depths : list[str]
+        the depths in the order they were fitted
+
+    aliases : dict[str, str]
+        depths past the fixed point of a run, labelled like the depth they
+        map to
+
+    centroids, sizes, labels : dict[str, numpy.ndarray]
+        per depth, the centroid, number of lines and label code of every
+        cluster
+    """
+
+    def __init__(self, strings=(), fingerprint=None):
+        self.strings = list(strings)
+        self.fingerprint = fingerprint
+        self.depths, self.aliases = [], {}
+        self.centroids, self.sizes, self.labels = {}, {}, {}
+
+    def add(self, depth, embedding, clusters, weights, labels):
+        """
+        Fit a depth
+
+        Parameters
+        ----------
+        depth : float
+
+        embedding : numpy.ndarray
+            embedding of every target
+
+        clusters : numpy.ndarray
+            cluster of every target
+
+        weights : numpy.ndarray
+            number of lines of every target
+
+        labels : numpy.ndarray
+            label code of every target
+        """
+        ids, firsts, inverse = np.unique(
+            clusters, return_index=True, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+        sizes = np.bincount(inverse, weights=weights)
+        embedding = np.asarray(embedding, dtype=np.float64)
+        total = totals(inverse, embedding, len(ids), weights)
+
+        name = f"{depth}"
+        self.depths.append(name)
+        self.centroids[name] = (total / sizes[:, None]).astype(np.float32)
+        self.sizes[name] = sizes
+        self.labels[name] = np.asarray(labels, dtype=np.int32)[firsts]
+
+    def alias(self, depth, source):
+        """
+        Fit a depth with the same labels as an earlier one
+
+        Parameters
+        ----------
+        depth : float
+
+        source : float
+            the fitted depth it is a copy of
+        """
+        self.depths.append(f"{depth}")
+        self.aliases[f"{depth}"] = f"{source}"
+
+    def dump(self, ck, name):
+        """
+        Save the arrays of a depth to a checkpoint
+
+        Parameters
+        ----------
+        ck : optimus.core.checkpoint.Checkpoint
+
+        name : str
+            the depth
+        """
+        for part in parts:
+            ck.save(f"fitted-{part}-{name}.npy", getattr(self, part)[name])
+
+    def restore(self, ck, name):
+        """
+        Load the arrays of a depth from a checkpoint, see ``dump``
+        """
+        self.depths.append(name)
+        for part in parts:
+            getattr(self, part)[name] = ck.load(f"fitted-{part}-{name}.npy")
+
+    def save(self, path):
+        """
+        Save to a directory
+
+        Parameters
+        ----------
+        path : str
+        """
+        ck = Checkpoint(*os.path.split(os.path.abspath(path)))
+        for name in self.depths:
+            if name not in self.aliases:
+                self.dump(ck, name)
+        # the index last: a directory without it is incomplete
+        index = dict(depths=self.depths, aliases=self.aliases, strings=self.strings)
+        ck.save("fitted.json", dict(index, fingerprint=self.fingerprint))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load from a directory, see ``save``
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        Fitted
+        """
+        ck = Checkpoint(*os.path.split(os.path.abspath(path)))
+        index = ck.load("fitted.json")
+        fitted = cls(index["strings"], index["fingerprint"])
+        aliases = index.get("aliases", {})
+        for name in index["depths"]:
+            if name in aliases:
+                fitted.alias(name, aliases[name])
+            else:
+                fitted.restore(ck, name)
+        return fitted
+
+    def assign(self, targets, embed):
+        """
+        Label new targets with the nearest cluster at every depth
+
+        Parameters
+        ----------
+        targets : list[str]
+            distinct parsed targets
+
+        embed : function
+            list[str] -> numpy.ndarray, e.g. an
+            optimus.core.embedding.fasttext.Embedder
+
+        Returns
+        -------
+        tuple[list[str], dict[str, numpy.ndarray], numpy.ndarray]
+            the string table (``strings`` followed by the new targets), the
+            label code of every target per depth and whether every target
+            is outside the fitted clusters
+        """
+        index = {string: code for code, string in enumerate(self.strings)}
+        table, current = intern(targets, index)
+        empty = index.get("", -1)
+
+        labels, outside = {}, np.zeros(len(targets), dtype=bool)
+        for name in self.depths:
+            if name in self.aliases:
+                labels[name] = labels[self.aliases[name]]
+                continue
+            distinct, rows = intern(current.tolist())
+            xs = np.asarray(embed([table[code] for code in distinct]))
+            centroids = np.asarray(self.centroids[name])
+            closest = nearest(xs, centroids)
+
+            if name == self.depths[0]:
+                sizes = np.asarray(self.sizes[name])[closest]
+                distance = np.linalg.norm(xs - centroids[closest], axis=1)
+                # ward distance between a single line and its nearest cluster
+                ward = np.sqrt(2 * sizes / (sizes + 1)) * distance
+                outside = (ward > float(name))[rows]
+
+            labels[name] = np.asarray(self.labels[name])[closest][rows]
+            current = np.where(labels[name] == empty, current, labels[name])
+        return table, labels, outside
@@ -0,0 +1,181 @@
+"""
+model registry
+==============
+
+Lazily loaded, process wide shared models and resources.
+
+Nothing is loaded on import. Every resource is loaded the first time it is
+asked for and the same object is handed out from then on, so the spacy
+``Language`` used for parsing is also the one used by the hypernym tier.
+``warmup`` can be used to pay the loading cost ahead of time.
+
+"""
+# stdlib
+import logging
+import pkgutil
+import threading
+
+# third party
+import toml
+
+logger = logging.getLogger(__name__)
+
+# default spacy model used across optimus
+spacy_model = "en_core_web_md"
+
+_registry = {}
+_lock = threading.RLock()
+
+
+def fetch(key, loader):
+    """
+    Fetch a resource from the registry, loading it on first use
+
+    Parameters
+    ----------
+    key : hashable
+        the name the resource is registered under
+
+    loader : function
+        zero argument function that loads the resource,
+        it is only called if ``key`` is not registered yet
+
+    Returns
+    -------
+    object
+        the registered resource
+    """
+    with _lock:
+        if key not in _registry:
+            _registry[key] = loader()
+        return _registry[key]
+
+
+def register(key, resource):
+    """
+    Register a resource, replacing any resource under the same key.
+    Useful to inject an already loaded (or a lightweight stand-in) model.
+
+    Parameters
+    ----------
+    key : hashable
+        the name to register the resource under
+
+    resource : object
+        the resource to register
+    """
+    with _lock:
+        _registry[key] = resource
+
+
+def clear():
+    """
+    Drop all the registered resources so they can be garbage collected
+    """
+    with _lock:
+        _registry.clear()
+
+
+def load_spacy(name):
+    """
+    Load a spacy model
+
+    Parameters
+    ----------
+    name : str
+        name of the spacy model
+
+    Returns
+    -------
+    spacy.language.Language
+    """
+    import spacy
+
+    logger.warning(f"Loading `{name}` model from spacy. Might take a few seconds.")
+    return spacy.load(name)
+
+
+def nlp(name=spacy_model):
+    """
+    The shared spacy model, loaded on first use
+
+    Parameters
+    ----------
+    name : str
+        name of the spacy model
+
+    Returns
+    -------
+    spacy.language.Language
+    """
+    return fetch(("spacy", name), lambda: load_spacy(name))
+
+
+def load_regexes():
+    """
+    Read the default regex table from the ``optimus/etc/regexes``
+    file shipped with the package
+
+    Returns
+    -------
+    dict
+        regex to replacement mapping
+    """
+    return toml.loads(pkgutil.get_data("optimus", "etc/regexes").decode("utf-8"))
+
+
+def regexes():
+    """
+    The default regex table, read on first use
+
+    Returns
+    -------
+    dict
+    """
+    return fetch("regexes", load_regexes)
+
+
+def load_wordnet():
+    """
+    Import the wordnet lookup from spacy_wordnet and make sure the nltk
+    wordnet corpus is read in
+
+    Returns
+    -------
+    type
+        ``spacy_wordnet.wordnet_domains.Wordnet``
+    """
+    from nltk.corpus import wordnet as wn
+    from spacy_wordnet.wordnet_domains import Wordnet
+
+    wn.ensure_loaded()
+    return Wordnet
+
+
+def wordnet():
+    """
+    The wordnet lookup used by the hypernym tier, loaded on first use
+
+    Returns
+    -------
+    type
+    """
+    return fetch("wordnet", load_wordnet)
+
+
+def warmup(name=spacy_model, hypernyms=True):
+    """
+    Load the models ahead of time (e.g. before forking workers)
+
+    Parameters
+    ----------
+    name : str
+        name of the spacy model
+
+    hypernyms : bool
+        whether to also load what the hypernym tier needs
+    """
+    regexes()
+    nlp(name)
+    if hypernyms:
+        wordnet()
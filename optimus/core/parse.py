@@ -1,22 +1,22 @@
 # stdlib
 import re
 
+try:
+    from re import _parser as sre_parse  # python 3.11+
+except ImportError:
+    import sre_parse
+
 # third party
-import toml
-import spacy as sp
 import toolz as fp
-import pandas as pd
 
-# load spacy model
-print("[WARN] Loading `en_core_web_md` model from spacy. Might take a few seconds.")
-nlp = sp.load("en_core_web_md")
+# project
+from optimus.core import models
 
-# load in default_regex strings
-with open("optimus/etc/regexes") as handle:
-    replace = toml.load(handle)
+# pipeline components that are not needed to find the keyword and its lemma
+unused = ("ner", "entity_ruler", "entity_linker", "textcat", "textcat_multilabel")
 
 # helper for regex
-def default_cleaner(string, regex_dict=replace):
+def default_cleaner(string, regex_dict=None):
     """
     default_cleaner(string, regex_dict={"regex":"replacement"})
 
@@ -35,12 +35,14 @@ def default_cleaner(string, regex_dict=replace):
 
     regex_dict : dict
         dictionary containing the replacement
-        regex and the thing to replace it with
+        regex and the thing to replace it with,
+        defaults to the ``optimus/etc/regexes`` table
 
     Returns
     -------
     str
     """
+    regex_dict = models.regexes() if regex_dict is None else regex_dict
     string = string.lower()
     return fp.compose(
         *[fp.partial(re.sub, i, j, flags=re.IGNORECASE) for i, j in regex_dict.items()]
@@ -49,6 +51,161 @@ def default_cleaner(string, regex_dict=replace):
 
 default_cleanerM = fp.partial(map, default_cleaner)
 
+# opcodes of patterns that always match exactly one character, without context
+single = (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.IN, sre_parse.ANY)
+
+
+def singular(pattern):
+    """
+    Check if a regex only ever matches one character and does not
+    look at its surroundings (e.g. ``[^a-z]`` or ``\\n`` but not ``\\b\\w``)
+
+    Parameters
+    ----------
+    pattern : str
+
+    Returns
+    -------
+    bool
+    """
+    parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    return len(parsed) == 1 and parsed[0][0] in single
+
+
+def fuse(rules):
+    """
+    Group consecutive cleaning rules that can be applied in a single pass.
+
+    Running ``re.sub`` with rule A and then with rule B gives the same
+    result as one pass of ``A|B`` when B matches exactly one character
+    without context, no earlier replacement in the group produces a character
+    B matches and A can not match the empty string. All the patterns in a
+    group after the first one are therefore single characters.
+
+    Parameters
+    ----------
+    rules : list[tuple[str, str]]
+        (regex, replacement) pairs in the order they are applied
+
+    Returns
+    -------
+    list[list[tuple[str, str]]]
+        the rules split into groups, in order
+    """
+    groups = []
+    for pattern, replacement in rules:
+        group = groups and groups[-1]
+        head = group and group[0][0]
+        if (
+            group
+            and singular(pattern)
+            and re.compile(head, re.IGNORECASE).groups == 0
+            and sre_parse.parse(head, re.IGNORECASE).getwidth()[0] > 0
+            and all("\\" not in r for _, r in group + [(pattern, replacement)])
+            and not any(re.search(pattern, r, re.IGNORECASE) for _, r in group)
+        ):
+            group.append((pattern, replacement))
+        else:
+            groups.append([(pattern, replacement)])
+    return groups
+
+
+def compile_(group):
+    """
+    Compile a group of rules (see ``fuse``) into a single ``re.sub`` pass
+
+    Parameters
+    ----------
+    group : list[tuple[str, str]]
+
+    Returns
+    -------
+    function
+        str -> str
+    """
+    if len(group) == 1:
+        ((pattern, replacement),) = group
+        return fp.partial(re.compile(pattern, re.IGNORECASE).sub, replacement)
+
+    replacements = {f"r{i}": r for i, (_, r) in enumerate(group)}
+    if len(set(replacements.values())) == 1:
+        regex = "|".join(f"(?:{p})" for p, _ in group)
+        replacement = group[0][1]
+    else:
+        regex = "|".join(f"(?P<r{i}>{p})" for i, (p, _) in enumerate(group))
+        replacement = lambda match: replacements[match.lastgroup]
+    return fp.partial(re.compile(regex, re.IGNORECASE).sub, replacement)
+
+
+class Cleaner:
+    """
+    A precompiled version of ``default_cleaner``
+
+    The regex table is compiled once and consecutive rules that can share
+    a pass over the string are combined (see ``fuse``), so cleaning a string
+    walks it as few times as the rules allow.
+
+    Parameters
+    ----------
+    regex_dict : dict
+        dictionary containing the replacement
+        regex and the thing to replace it with,
+        defaults to the ``optimus/etc/regexes`` table
+    """
+
+    def __init__(self, regex_dict=None):
+        regex_dict = models.regexes() if regex_dict is None else regex_dict
+        # default_cleaner composes the rules, so the last one is applied first
+        rules = list(regex_dict.items())[::-1]
+        self.passes = [compile_(group) for group in fuse(rules)]
+
+    def __call__(self, string):
+        """
+        Clean a single string, same as ``default_cleaner``
+
+        Parameters
+        ----------
+        string : str
+
+        Returns
+        -------
+        str
+        """
+        string = string.lower()
+        for pass_ in self.passes:
+            string = pass_(string)
+        return string
+
+    def clean_batch(self, strings):
+        """
+        Clean a list of strings, same as ``default_cleanerM``.
+        Repeated strings are only cleaned once.
+
+        Parameters
+        ----------
+        strings : list[str]
+
+        Returns
+        -------
+        list[str]
+        """
+        seen = {}
+        return [
+            seen[string] if string in seen else seen.setdefault(string, self(string))
+            for string in strings
+        ]
+
+
+def cleaner():
+    """
+    The shared ``Cleaner`` for the default regex table, compiled on first use
+
+    Returns
+    -------
+    Cleaner
+    """
+    return models.fetch("cleaner", Cleaner)
+
 # spacy based parsing
 def keyword(document):
     """
@@ -103,22 +260,39 @@ def vocab(word):
         it returns the original word or an empty string
         if the word is not in the vocabulary
     """
-    return word if word in nlp.vocab else ""
+    return word if word in models.nlp().vocab else ""
 
 
-parse_ = fp.compose(vocab, lemma, keyword, nlp)
+def parse_(text):
+    """
+    Parse a single text: pass it through the spacy model, get the keyword,
+    lemma it and check that it is in the vocabulary
 
+    Parameters
+    ----------
+    text : str
 
-def parse(texts):
+    Returns
+    -------
+    str
+    """
+    return vocab(lemma(keyword(models.nlp()(text))))
+
+
+def parse(texts, batch_size=1000, n_process=1):
     """
     Map the parsing function across the list of texts.
 
     The parsing function currently is:
-    - pass through a spacy model (nlp)
+    - pass through a spacy model (nlp) in batches
     - get the keyword of the sentence (keyword)
     - lemma the resulting word (lemma)
     - vocab check that the word is in the vocabulary (vocab)
 
+    The texts are streamed through ``nlp.pipe`` with the components listed
+    in ``unused`` (NER etc.) disabled. The output is in the same order as the
+    input and matches mapping ``parse_`` across the texts.
+
     For the single document version use: ``parse_``
 
     Parameters
@@ -126,8 +300,17 @@ def parse(texts):
     texts : list
         list of text strings
 
+    batch_size : int
+        number of texts to buffer and parse together
+
+    n_process : int
+        number of worker processes spacy should use (-1 for all cores)
+
     Returns
     -------
     map object
     """
-    return map(parse_, texts)
+    nlp = models.nlp()
+    disable = [name for name in nlp.pipe_names if name in unused]
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disable)
+    return map(fp.compose(vocab, lemma, keyword), docs)
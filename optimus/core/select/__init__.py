@@ -1,6 +1,4 @@
 # third party
-import toml
-import spacy
 import numpy as np
 import toolz as fp
 
@@ -9,6 +7,32 @@ from optimus.core.select import edits as ed
 from optimus.core.select import wordgrams as wg
 from optimus.core.select import chargrams as cg
 from optimus.core.select import hypernyms as hn
+from optimus.core.select import profile as pf
+from optimus.core.stats import Stats
+from optimus.utils import intern
+
+
+def partition(clusters):
+    """
+    Group rows by cluster number with one sort
+
+    Parameters
+    ----------
+    clusters : list[int]
+        list of cluster labels, any integers
+
+    Returns
+    -------
+    tuple[numpy.ndarray, list[numpy.ndarray]]
+        the group of every row (groups are numbered in order of cluster
+        number) and the rows of every group, as views into one array of
+        row indices
+    """
+    _, inverse = np.unique(clusters, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse))[:-1]
+    return inverse, np.split(order, bounds) if len(order) else []
 
 
 def build(xs, clusters):
@@ -27,9 +51,10 @@ def build(xs, clusters):
     -------
     list[numpy.ndarray]
         list of numpy arrays each containing text from each
-        cluster
+        cluster, in order of cluster number
     """
-    return (np.extract(clusters == i, xs) for i in np.unique(clusters))
+    xs = np.asarray(xs, dtype=object)
+    return (xs[rows] for rows in partition(clusters)[1])
 
 
 def fallback(xs):
@@ -50,12 +75,33 @@ def fallback(xs):
     return ""
 
 
-def build_represent(edit=0.75, wordgram=2.00, chargram=0.8, hypernym=0.00):
+# default thresholds of build_represent
+defaults = {
+    "edit": 0.75,
+    "wordgram": 2.00,
+    "chargram": 0.8,
+    "hypernym": 0.00,
+    "edit_limit": None,
+}
+
+# names of the tiers, in the order they are tried
+tiers = ("edit", "wordgram", "chargram", "hypernym", "fallback")
+
+
+def build_represent(
+    edit=0.75, wordgram=2.00, chargram=0.8, hypernym=0.00, edit_limit=None, stats=None
+):
     """
     Given a set of thresholds (edit, wordgram, chargram, hypernym)
     return a function that would get the right represenatation for the
     cluster.
 
+    The returned function works on the ``Profile`` of the cluster, so the
+    tiers share what they compute and a cluster that was already labelled
+    with the same thresholds is not scored again. Conditions get what they
+    need from the profile as a function, so the matrices and indices are
+    only built once a condition gets past its cheap checks.
+
     Parameters
     ----------
     edit : float
@@ -70,36 +116,165 @@ def build_represent(edit=0.75, wordgram=2.00, chargram=0.8, hypernym=0.00):
     hypernym : float
         float for thresholding hypernym wordnet
 
+    edit_limit : int
+        above this number of pairs in a cluster the average edit
+        similarity is estimated by sampling pairs, by default it is always
+        exact (see optimus.core.select.edits.condition)
+
+    stats : optimus.core.stats.Stats
+        collects the time spent in every tier and how many groups each tier
+        labelled (``select.<tier>``), and how many groups were already
+        labelled (``select.memoised``)
+
     Returns
     -------
     function
     """
     # exposed default interfaces
     def represent_(decisions, functions, group):
-        for d, f in zip(decisions, functions):
-            if d(group):
-                return f(group)  # stops the first time that d(group) is true
+        p = pf.profile(group)
+        if key in p.labels:  # identical groups are only labelled once
+            stats.count("select.memoised")
+            return p.labels[key]
+
+        for tier, d, f in zip(tiers, decisions, functions):
+            with stats.timer(f"select.{tier}", record=False):
+                if d(p):
+                    p.labels[key] = f(p)  # stops the first time that d(p) is true
+            if key in p.labels:
+                stats.count(f"select.{tier}")
+                p.forget()
+                return p.labels[key]
+
+    key = (edit, wordgram, chargram, hypernym, edit_limit)
+    stats = Stats() if stats is None else stats
 
     decisions = (
-        lambda xs: ed.condition(xs) > edit,  # high lexical similarity
-        lambda xs: wg.condition(xs) > wordgram,  # medium lexical similarity
-        lambda xs: cg.condition(xs) > chargram,  # low lexical similarity
-        lambda xs: hn.condition(xs) > hypernym,  # semantic similarity
-        lambda xs: True,  # default always true fallback
+        # high lexical similarity
+        lambda p: ed.condition(p.members, edit_limit, similarity=lambda: p.edits)
+        > edit,
+        # medium lexical similarity
+        lambda p: wg.condition(p.members) > wordgram,
+        # low lexical similarity
+        lambda p: cg.condition(p.members, lambda: p.chargrams) > chargram,
+        lambda p: hn.condition(p.members) > hypernym,  # semantic similarity
+        lambda p: True,  # default always true fallback
     )
 
     functions = (
-        lambda xs: ed.selection(xs),  # high lexical similarity
-        lambda xs: wg.selection(xs),  # medium lexical similarity
-        lambda xs: cg.selection(xs),  # low lexical similarity
-        lambda xs: hn.selection(xs),  # semantic similarity
-        lambda xs: fallback(xs),  # default fallback
+        lambda p: ed.selection(p.members, p.edits),  # high lexical similarity
+        lambda p: wg.selection(p.members, p.wordgrams),  # medium lexical similarity
+        lambda p: cg.selection(p.members, p.chargrams),  # low lexical similarity
+        lambda p: hn.selection(p.members),  # semantic similarity
+        lambda p: fallback(p.group),  # default fallback
     )
 
     return fp.partial(represent_, decisions, functions)
 
 
-def select(xs, clusters, **thresholds):
+def represent_chunk(groups, thresholds):
+    """
+    Label a chunk of groups, the unit of work of a parallel ``select``
+
+    Parameters
+    ----------
+    groups : list[list[str]]
+        the groups to label
+
+    thresholds : dict
+        thresholds for ``build_represent``
+
+    Returns
+    -------
+    tuple[list[str], Stats]
+        a label per group and the statistics of the chunk
+    """
+    stats = Stats()
+    represent = build_represent(stats=stats, **thresholds)
+    return [represent(group) for group in groups], stats
+
+
+def schedule(groups, chunksize=1000):
+    """
+    Split groups into chunks of work. Groups are taken largest first and
+    small groups are packed together until a chunk holds ``chunksize``
+    texts, so the pool starts on the slowest work and does not pay a
+    round trip for every small group.
+
+    Parameters
+    ----------
+    groups : list[list[str]]
+
+    chunksize : int
+        number of texts to pack into a chunk
+
+    Returns
+    -------
+    list[list[int]]
+        the indices of the groups in every chunk
+    """
+    chunks, chunk, size = [], [], 0
+    for i in sorted(range(len(groups)), key=lambda i: -len(groups[i])):
+        chunk.append(i)
+        size += len(groups[i])
+        if size >= chunksize:
+            chunks.append(chunk)
+            chunk, size = [], 0
+    return chunks + [chunk] if chunk else chunks
+
+
+def represent_parallel(groups, executor, chunksize=1000, stats=None, **thresholds):
+    """
+    Label groups on an executor. Groups already labelled with the same
+    thresholds in this process are not sent, and the labels that come back
+    are recorded on the local profiles so later depths can reuse them.
+
+    Parameters
+    ----------
+    groups : list[list[str]]
+
+    executor : concurrent.futures.Executor
+        e.g. a ``ProcessPoolExecutor``
+
+    chunksize : int
+        see ``schedule``
+
+    stats : optimus.core.stats.Stats
+        see ``build_represent``, the statistics of the workers are added
+
+    **thresholds
+        see ``build_represent``
+
+    Returns
+    -------
+    list[str]
+        a label per group, in the order of ``groups``
+    """
+    key = tuple({**defaults, **thresholds}[name] for name in defaults)
+    profiles = [pf.profile(group) for group in groups]
+    pending = [i for i, p in enumerate(profiles) if key not in p.labels]
+    if stats is not None:
+        stats.count("select.memoised", len(groups) - len(pending))
+
+    chunks = schedule([profiles[i].group for i in pending], chunksize)
+    futures = [
+        executor.submit(
+            represent_chunk, [profiles[pending[i]].group for i in chunk], thresholds
+        )
+        for chunk in chunks
+    ]
+    for chunk, future in zip(chunks, futures):
+        labels, chunkstats = future.result()
+        if stats is not None:
+            stats.merge(chunkstats)
+        for i, label in zip(chunk, labels):
+            profiles[pending[i]].labels[key] = label
+    return [p.labels[key] for p in profiles]
+
+
+def select(
+    xs, clusters, executor=None, chunksize=1000, coded=False, stats=None, **thresholds
+):
     """
     Select appropriate label using the labelling steps
     of edit distance -> wordgrams -> chargrams -> wordnet
@@ -113,6 +288,20 @@ def select(xs, clusters, **thresholds):
         list of cluster numbers corresponding to where the
         existing label is allocated
 
+    executor : concurrent.futures.Executor
+        if given, the groups are labelled on it (e.g. a
+        ``ProcessPoolExecutor``), the labels are the same as serially
+
+    chunksize : int
+        number of texts sent to the executor at a time, small groups are
+        packed together up to this size
+
+    coded : bool
+        return the labels as codes into a table of the distinct labels
+
+    stats : optimus.core.stats.Stats
+        collects per tier statistics (see ``build_represent``)
+
     **thresholds
         you can pass custom threshold values here to alter the
         default cutoffs.
@@ -127,12 +316,26 @@ def select(xs, clusters, **thresholds):
 
         hypernym - float for thresholding hypernym wordnet (default: 0.0)
 
+        edit_limit - number of pairs above which the edit similarity of a
+        cluster is estimated by sampling (default: None, always exact)
+
     Returns
     -------
-    list[str]
-        labels assigned through the selection procedure
+    list[str] | tuple[list[str], numpy.ndarray]
+        labels assigned through the selection procedure, or with ``coded``
+        the distinct labels and an int32 code per text
     """
-    represent = build_represent(**thresholds)
-    groups = build(xs, clusters)
-    labels = [represent(group) for group in groups]
-    return (labels[cluster - 1] for cluster in clusters)
+    inverse, rows = partition(clusters)
+    xs = np.asarray(xs, dtype=object)
+    groups = (xs[index] for index in rows)
+    if executor is None:
+        represent = build_represent(stats=stats, **thresholds)
+        labels = [represent(group) for group in groups]
+    else:
+        labels = represent_parallel(
+            list(groups), executor, chunksize, stats, **thresholds
+        )
+    if coded:
+        table, index = intern(labels)
+        return table, index.astype(np.int32)[inverse]
+    return iter(np.asarray(labels, dtype=object)[inverse].tolist())
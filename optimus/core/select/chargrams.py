@@ -6,7 +6,6 @@ from difflib import SequenceMatcher
 
 # third party
 import numpy as np
-from textacy.similarity import jaccard, levenshtein
 
 # project
 from optimus.utils import strip, unpack
@@ -54,7 +53,65 @@ def get(x, n):
     return re.findall(regex, x)
 
 
-def scorer(xs):
+def index(xs, start=3, finish=20):
+    """
+    Document frequency of every charactergram between set lengths,
+    i.e. for each ngram the number of texts it is a substring of.
+
+    Every text contributes each of its distinct ngrams once, so this is
+    linear in the total length of the texts (times the ngram lengths)
+    instead of checking every ngram against every text.
+
+    Parameters
+    ----------
+    xs : list[str]
+        list of texts to process
+
+    start : int
+        min length for ngram
+
+    finish : int
+        max length of ngram
+
+    Returns
+    -------
+    dict[str, int]
+        ngram to document frequency, in the order ``characters``
+        first produces each ngram
+    """
+    df = {}
+    for x in xs:
+        seen = {}
+        # ``characters`` does not match across newlines
+        for segment in x.split("\n"):
+            for n in range(start, finish):
+                for i in range(len(segment) - n + 1):
+                    seen[segment[i : i + n]] = None
+        for gram in seen:
+            df[gram] = df.get(gram, 0) + 1
+    return df
+
+
+def score(gram, df):
+    """
+    Score of a charactergram, its document frequency squared weighted
+    by its length
+
+    Parameters
+    ----------
+    gram : str
+
+    df : dict[str, int]
+        document frequencies (see ``index``)
+
+    Returns
+    -------
+    float
+    """
+    return df[gram] ** 2 * (1 + log(len(gram)))
+
+
+def scorer(xs, df=None):
     """
     Calculate maximum score across texts
 
@@ -63,20 +120,22 @@ def scorer(xs):
     xs : list[str]
         list of texts to calculate scores for
 
+    df : dict[str, int]
+        precomputed ``index(xs)``
+
     Returns
     -------
     float
         maximum score across the list of texts
     """
-    cgrams = characters(xs)
-    score = (sum(i in j for j in xs) ** 2 * (1 + log(len(i))) for i in cgrams)
-    return max(score)
+    df = index(xs) if df is None else df
+    return max(score(gram, df) for gram in df)
 
 
-# TODO make sure this works when 2 have the same number on the score
-def label(xs):
+def label(xs, df=None):
     """
-    Pick the label that has the maximum score
+    Pick the label that has the maximum score, ties go to
+    the ngram that comes first in ``characters(xs)``
 
     Parameters
     ----------
@@ -84,21 +143,22 @@ def label(xs):
         list of texts that will be processed and the
         highest score returned
 
+    df : dict[str, int]
+        precomputed ``index(xs)``
+
     Returns
     -------
-    float
+    str
     """
-    cgrams = characters(xs)
-    score = [np.sum(i in j for j in xs) ** 2 * (1 + log(len(i))) for i in cgrams]
-    candidate = [cgrams[i] for i, j in enumerate(score) if j == np.max(score)]
-    return candidate[0]
+    df = index(xs) if df is None else df
+    return max(df, key=lambda gram: score(gram, df))
 
 
 # +TODO: brain not working, make this betterer
 
 
 # charactergram measurement
-def condition(xs):
+def condition(xs, df=None):
     """
     Find the longest common ngram metric
 
@@ -106,6 +166,11 @@ def condition(xs):
     ----------
     xs : list[str]
         list of texts to use for ngram finding
+
+    df : function
+        returns the precomputed ``index`` of the non empty texts, only
+        called when the cluster is scored
+
     Returns
     -------
     float
@@ -115,11 +180,11 @@ def condition(xs):
         0.0
         if ((len(xs_) <= 1) or (np.min([len(x) for x in xs_]) < 3))
         # TODO: if there is only one item then its vacuously 0?
-        else scorer(xs_)
+        else scorer(xs_, None if df is None else df())
     )
 
 
-def selection(xs):
+def selection(xs, df=None):
     """
     Selecting the text which has most similarity with all other texts
     through chargram similarity
@@ -129,9 +194,12 @@ def selection(xs):
     xs : list[str]
         text to be selected from
 
+    df : dict[str, int]
+        precomputed ``index`` of the non empty texts
+
     Returns
     -------
     str
     """
     xs_ = strip(xs)
-    return label(xs_)
+    return label(xs_, df)
@@ -1,17 +1,184 @@
 # stdlib
-import itertools
+from collections import Counter, namedtuple
 
 # third party
 import numpy as np
 
-from textacy.similarity import levenshtein
-
 # project
 from optimus.utils import strip
 
 
+def masks(pattern):
+    """
+    Bit mask of the positions of every character of a pattern
+
+    Parameters
+    ----------
+    pattern : str
+
+    Returns
+    -------
+    dict[str, int]
+    """
+    peq = {}
+    for i, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | 1 << i
+    return peq
+
+
+def myers(peq, m, text):
+    """
+    Levenshtein distance between a pattern and a text using the
+    bit-parallel algorithm of Myers (as formulated by Hyyro), one word
+    operation per character of the text on python's arbitrary length
+    integers
+
+    Parameters
+    ----------
+    peq : dict[str, int]
+        ``masks`` of the pattern
+
+    m : int
+        length of the pattern
+
+    text : str
+
+    Returns
+    -------
+    int
+    """
+    if not m:
+        return len(text)
+
+    full, last = (1 << m) - 1, 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv) & full
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1 | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | ~(xv | ph) & full
+        mv = ph & xv
+    return score
+
+
+def distance(x, y):
+    """
+    Levenshtein distance, see ``myers``
+
+    Parameters
+    ----------
+    x : str
+
+    y : str
+
+    Returns
+    -------
+    int
+    """
+    return myers(masks(y), len(y), x)
+
+
+def levenshtein(x, y, peq=None):
+    """
+    Levenshtein similarity in the closed interval [0,1], same as
+    ``textacy.similarity.levenshtein``
+
+    Parameters
+    ----------
+    x : str
+
+    y : str
+
+    peq : dict[str, int]
+        precomputed ``masks(y)``
+
+    Returns
+    -------
+    float
+    """
+    if not x and not y:
+        return 0.0
+    if x == y:
+        return 1.0
+    peq = masks(y) if peq is None else peq
+    return 1.0 - myers(peq, len(y), x) / max(len(x), len(y))
+
+
+# edit similarity of the distinct texts of a cluster, and how often each
+# of them appears
+Similarity = namedtuple("Similarity", ["texts", "weights", "matrix"])
+
+
+def matrix(xs):
+    """
+    Edit similarity matrix of the distinct texts of a cluster. Every
+    distinct pair is only computed once (upper triangle) and mirrored,
+    duplicates are kept as weights.
+
+    Parameters
+    ----------
+    xs : list[str]
+
+    Returns
+    -------
+    Similarity
+    """
+    counts = Counter(xs)
+    distinct = list(counts)
+
+    n = len(distinct)
+    similarity = np.eye(n) * [levenshtein(x, x) for x in distinct]
+    for i in range(n):
+        peq = masks(distinct[i])
+        for j in range(i + 1, n):
+            similarity[i, j] = levenshtein(distinct[j], distinct[i], peq)
+    similarity += np.triu(similarity, 1).T
+    weights = np.array([counts[x] for x in distinct], dtype=np.float64)
+    return Similarity(distinct, weights, similarity)
+
+
+def estimate(xs, error=0.01, batch=1000, seed=0):
+    """
+    Estimate the mean edit similarity over all pairs by sampling pairs
+    until the 95% confidence interval is within ``error``
+
+    Parameters
+    ----------
+    xs : list[str]
+
+    error : float
+        half width of the confidence interval to stop at
+
+    batch : int
+        pairs to draw at a time
+
+    seed : int
+        seed for the random number generator
+
+    Returns
+    -------
+    float
+    """
+    rng = np.random.RandomState(seed)
+    n, samples = len(xs), []
+    while True:
+        i = rng.randint(n, size=batch)
+        j = (i + rng.randint(1, n, size=batch)) % n  # any other element
+        samples.extend(levenshtein(xs[a], xs[b]) for a, b in zip(i, j))
+        if 1.96 * np.std(samples) / np.sqrt(len(samples)) <= error:
+            return np.mean(samples)
+
+
 # maps levenshtein distance into the closed interval [0,1]
-def condition(xs):
+def condition(xs, limit=None, error=0.01, similarity=None):
     """
     Average edit distance on a cluster
 
@@ -20,16 +187,31 @@ def condition(xs):
     xs : list[str]
          list of texts to calculate the edit distances from
 
+    limit : int
+        above this number of pairs the average is estimated by sampling
+        (see ``estimate``), by default it is always exact
+
+    error : float
+        error bound for the estimate
+
+    similarity : function
+        returns the precomputed ``matrix`` of the non empty texts, only
+        called when the exact average is needed
+
     Returns
     -------
     float
     """
     xs_ = strip(xs)
-    return (
-        0.0  # levenshtein returns 1 if they are identical
-        if len(xs_) <= 1
-        else np.mean([levenshtein(*ys) for ys in itertools.combinations(xs_, 2)])
-    )
+    n = len(xs_)
+    if n <= 1:
+        return 0.0  # levenshtein returns 1 if they are identical
+    if limit is not None and n * (n - 1) // 2 > limit:
+        return estimate(xs_, error)
+    _, weights, similarity = matrix(xs_) if similarity is None else similarity()
+    # every pair of texts once, duplicates included, without the text itself
+    total = weights @ similarity @ weights - weights @ np.diag(similarity)
+    return total / (n * (n - 1))
 
 
 def editMatrix(xs):
@@ -46,11 +228,15 @@ def editMatrix(xs):
     numpy.ndarray
         the distance array
     """
-    return np.array([[levenshtein(x, y) for y in xs] for x in strip(xs)])
+    xs_ = strip(xs)
+    texts, _, similarity = matrix(xs_)
+    index = {text: i for i, text in enumerate(texts)}
+    rows = np.array([index[x] for x in xs_], dtype=np.intp)
+    return similarity[np.ix_(rows, rows)]
 
 
 # +TODO: selection doesnt run if you have an empty list or just 1 empty string
-def selection(xs):
+def selection(xs, similarity=None):
     """
     Selecting the text which has most similarity with all other texts
     using levenshtein distance
@@ -60,9 +246,13 @@ def selection(xs):
     xs : list[str]
         text to be selected from
 
+    similarity : Similarity
+        precomputed ``matrix`` of the non empty texts
+
     Returns
     -------
     str
     """
     xs_ = strip(xs)
-    return xs_[np.sum(editMatrix(xs_), axis=1).argmax()]
+    texts, weights, similarity = matrix(xs_) if similarity is None else similarity
+    return texts[(similarity @ weights).argmax()]
@@ -1,19 +1,19 @@
 # base
-import itertools
+import functools
 
-# third party
-import spacy
-import numpy as np
-
-from textacy.similarity import jaccard
-from spacy_wordnet.wordnet_annotator import WordnetAnnotator
+from collections import OrderedDict
 
 # project
 from optimus.utils import strip
-from optimus.core.parse import keyword, nlp
+from optimus.core import models
+from optimus.core.parse import keyword, unused
+
+# number of texts and lemmas whose synsets are remembered
+maxsize = 2 ** 16
+
+_texts = OrderedDict()  # text -> synsets of its keyword
+_lemmas = OrderedDict()  # (text, lemma, pos, lang) of a keyword -> synsets
 
-model = spacy.load("en_core_web_md")
-model.add_pipe(WordnetAnnotator(model.lang), after="tagger")
 
 # semantic similarity
 def condition(xs):
@@ -55,6 +55,11 @@ def hypernyms(
     """
     Given a list of words/texts find a common hypernym
 
+    The synsets of every text are compared with the synsets of all the
+    texts after it, in order, and the first lowest common hypernym that is
+    not too abstract is returned. The pairs are only looked at until that
+    hypernym is found.
+
     Parameters
     ----------
     xs : list[str]
@@ -65,27 +70,25 @@ def hypernyms(
     str
         common hypernym
     """
-    corpus = map(keyword, gencorpus(xs))
-
-    syns = [token._.wordnet.synsets() for token in corpus]
-    lengths = [len(s) for s in syns]
+    syns = lookup(xs)
     flatM = [j for i in syns for j in i]
 
-    common = []
-    for length in lengths:
-        left = flatM[:length]
-        right = flatM[length:]
+    start = 0
+    for s in syns:
+        left = flatM[start : start + len(s)]
+        right = flatM[start + len(s) :]
+        start += len(s)
 
-        for i, j in itertools.product(left, right):
-            common.append(lca(i, j))
-        flatM = right
-
-    # remove things which are too abstract
-    common = [j.name().split(".")[0] for i in common for j in i]
-    common = [i for i in common if i not in avoided_hypernyms]
+        for i in left:
+            for j in right:
+                for common in lca(i, j):
+                    name = common.name().split(".")[0]
+                    # remove things which are too abstract
+                    if name not in avoided_hypernyms:
+                        return name.replace("_", " ")
 
     # if it cannot find a common hypernym returns empty string
-    return (len(common) and common[0].replace("_", " ")) or ""
+    return ""
 
 
 def gendoc(x):
@@ -100,7 +103,7 @@ def gendoc(x):
     -------
     spacy.tokens.doc.Doc
     """
-    return model(str(x))
+    return models.nlp()(str(x))
 
 
 def gencorpus(xs):
@@ -118,9 +121,153 @@ def gencorpus(xs):
     return map(gendoc, xs)
 
 
+def keywords(xs):
+    """
+    Keyword token of every text. Single words (e.g. the labels of an
+    earlier depth) are their own keyword, so they only go through the
+    tagger and lemmatizer, without the dependency parser. A word that
+    spacy splits into several tokens (e.g. "e-mail") is parsed like any
+    other text.
+
+    Parameters
+    ----------
+    xs : list[str]
+
+    Returns
+    -------
+    list[spacy.tokens.token.Token]
+    """
+    nlp = models.nlp()
+    words = [i for i, x in enumerate(xs) if len(str(x).split()) == 1]
+    disable = [name for name in nlp.pipe_names if name in unused + ("parser",)]
+
+    tokens = [None] * len(xs)
+    for i, doc in zip(words, nlp.pipe([str(xs[i]) for i in words], disable=disable)):
+        if len(doc) == 1:
+            tokens[i] = doc[0]
+    for i, token in enumerate(tokens):
+        if token is None:
+            tokens[i] = keyword(gendoc(xs[i]))
+    return tokens
+
+
+def remember(cache, key, value):
+    cache[key] = value
+    if len(cache) > maxsize:
+        cache.popitem(last=False)
+    return value
+
+
+def lookup(xs):
+    """
+    Synsets of the keyword of every text, texts that were seen before are
+    not parsed again and keywords with the same lemma share their lookup
+
+    Parameters
+    ----------
+    xs : list[str]
+
+    Returns
+    -------
+    list[tuple[nltk.corpus.reader.wordnet.Synset]]
+    """
+    found = {}
+    for x in dict.fromkeys(xs):
+        if x in _texts:
+            _texts.move_to_end(x)
+            found[x] = _texts[x]
+
+    missing = [x for x in dict.fromkeys(xs) if x not in found]
+    if missing:
+        for x, token in zip(missing, keywords(missing)):
+            found[x] = remember(_texts, x, synsets(token))
+    return [found[x] for x in xs]
+
+
+def synsets(token):
+    """
+    Wordnet synsets of a token from the shared spacy model
+
+    Parameters
+    ----------
+    token : spacy.tokens.token.Token
+
+    Returns
+    -------
+    tuple[nltk.corpus.reader.wordnet.Synset]
+    """
+    key = (token.text, token.lemma_, token.pos_, token.lang_)
+    if key in _lemmas:
+        _lemmas.move_to_end(key)
+        return _lemmas[key]
+    syns = models.wordnet()(token=token, lang=token.lang_).synsets()
+    return remember(_lemmas, key, tuple(syns))
+
+
+@functools.lru_cache(maxsize=maxsize)
+def closure(syn):
+    """
+    The synset and all its (instance) hypernyms
+
+    Parameters
+    ----------
+    syn : nltk.corpus.reader.wordnet.Synset
+
+    Returns
+    -------
+    frozenset
+    """
+    return frozenset().union(
+        [syn], *map(closure, syn.hypernyms() + syn.instance_hypernyms())
+    )
+
+
+@functools.lru_cache(maxsize=maxsize)
+def depth(syn):
+    """
+    Length of the longest hypernym path from the synset to a root
+
+    Parameters
+    ----------
+    syn : nltk.corpus.reader.wordnet.Synset
+
+    Returns
+    -------
+    int
+    """
+    parents = syn.hypernyms() + syn.instance_hypernyms()
+    return 1 + max(map(depth, parents)) if parents else 0
+
+
+@functools.lru_cache(maxsize=maxsize)
 def lca(syn1, syn2):
     """
-    Find lowest common ancestor
-   
+    Find lowest common ancestor, same as ``syn1.lowest_common_hypernyms(syn2)``:
+    the common hypernyms with the largest depth, sorted by name
+
+    Parameters
+    ----------
+    syn1 : nltk.corpus.reader.wordnet.Synset
+
+    syn2 : nltk.corpus.reader.wordnet.Synset
+
+    Returns
+    -------
+    tuple[nltk.corpus.reader.wordnet.Synset]
+    """
+    common = closure(syn1) & closure(syn2)
+    if not common:
+        return ()
+    deepest = max(map(depth, common))
+    return tuple(sorted(s for s in common if depth(s) == deepest))
+
+
+def clear():
+    """
+    Forget the remembered synsets and hypernyms
     """
-    return syn1.lowest_common_hypernyms(syn2)
+    _texts.clear()
+    _lemmas.clear()
+    closure.cache_clear()
+    depth.cache_clear()
+    lca.cache_clear()
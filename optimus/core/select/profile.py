@@ -0,0 +1,109 @@
+"""
+cluster profiles
+================
+
+Everything the selection tiers compute about a cluster, computed once.
+
+A ``Profile`` holds the texts of a cluster and lazily builds the stripped
+members, their tokens, the chargram index, the wordgram table and the edit
+similarity matrix the first time a tier asks for them, so a condition and
+the selection of the same tier (or of different tiers) share the work.
+
+Profiles are memoised by the content of the cluster: a group that comes up
+again at a later depth gets the same profile back, together with the
+labels already picked for it. Once a group is labelled its profile forgets
+everything but the labels, so the memo does not hold on to the matrices
+and indices of large clusters.
+
+"""
+# stdlib
+from collections import OrderedDict
+
+# project
+from optimus.utils import strip, lazy
+from optimus.core.select import edits as ed
+from optimus.core.select import wordgrams as wg
+from optimus.core.select import chargrams as cg
+
+# number of profiles kept around between calls
+maxsize = 4096
+
+_profiles = OrderedDict()
+
+
+class Profile:
+    """
+    Lazily computed representation of a cluster
+
+    Parameters
+    ----------
+    group : tuple[str]
+        the texts of the cluster
+    """
+
+    def __init__(self, group):
+        self.group = group
+        self.labels = {}  # label picked for a set of thresholds
+
+    @lazy
+    def members(self):
+        """non empty texts"""
+        return strip(self.group)
+
+    @lazy
+    def tokens(self):
+        """words of every non empty text"""
+        return [x.split() for x in self.members]
+
+    @lazy
+    def chargrams(self):
+        """chargram document frequencies (see ``chargrams.index``)"""
+        return cg.index(self.members)
+
+    @lazy
+    def wordgrams(self):
+        """wordgram table (see ``wordgrams.table``)"""
+        return wg.table(self.tokens)
+
+    @lazy
+    def edits(self):
+        """edit similarity matrix (see ``edits.matrix``)"""
+        return ed.matrix(self.members)
+
+    def forget(self):
+        """
+        Drop the lazily computed attributes, keeping the labels
+        """
+        for name, value in vars(Profile).items():
+            if isinstance(value, lazy):
+                self.__dict__.pop(name, None)
+
+
+def profile(group):
+    """
+    The profile of a cluster, shared by every cluster with the same texts
+
+    Parameters
+    ----------
+    group : list[str]
+        the texts of the cluster
+
+    Returns
+    -------
+    Profile
+    """
+    key = tuple(group)
+    if key in _profiles:
+        _profiles.move_to_end(key)
+        return _profiles[key]
+    _profiles[key] = Profile(key)
+    if len(_profiles) > maxsize:
+        _profiles.popitem(last=False)
+    return _profiles[key]
+
+
+def clear():
+    """
+    Forget all the memoised profiles
+    """
+    _profiles.clear()
@@ -1,8 +1,10 @@
+# stdlib
+from bisect import bisect_right
+from collections import Counter, namedtuple
+
 # third party
 import numpy as np
 
-from textacy.similarity import jaccard
-
 # project
 from optimus.utils import strip
 
@@ -61,12 +63,98 @@ def wordLen(xs):
         minimum word number for all texts in list
     """
     tokens = map(str.split, xs)
-    return np.min([len(w) for t in tokens for w in t])
+    return min((len(w) for t in tokens for w in t), default=0)
+
+
+# word ngram document frequencies of a cluster, ngrams are tuples of word ids
+Table = namedtuple("Table", ["ids", "df"])
+
+
+def table(tokens):
+    """
+    Build the word ngram table of a cluster. Words are interned once
+    per cluster and every text contributes each of its distinct ngrams
+    once, so ``df`` holds the number of texts containing each ngram.
+
+    Parameters
+    ----------
+    tokens : list[list[str]]
+        the words of every text of the cluster
+
+    Returns
+    -------
+    Table
+        ``ids`` maps words to their ids, ``df`` maps ngrams to their
+        document frequency in order of first appearance
+    """
+    ids, df = {}, {}
+    for words in tokens:
+        words = [ids.setdefault(word, len(ids)) for word in words]
+        seen = {}
+        for n in range(1, len(words) + 1):
+            for i in range(len(words) - n + 1):
+                seen[tuple(words[i : i + n])] = None
+        for gram in seen:
+            df[gram] = df.get(gram, 0) + 1
+    return Table(ids, df)
+
+
+def score(gram, df):
+    """
+    Score of a word ngram, its document frequency squared weighted by
+    the number of words in it
+
+    Parameters
+    ----------
+    gram : tuple[int]
+
+    df : dict[tuple[int], int]
+
+    Returns
+    -------
+    float
+    """
+    return df[gram] ** 2 * (1 + np.log(len(gram)))
+
+
+def contained(xs):
+    """
+    Number of texts every distinct text is a substring of. The distinct
+    texts are joined once and every text is searched for in the joined
+    string, so each text costs a scan in C instead of a python loop over
+    all the other texts.
+
+    Parameters
+    ----------
+    xs : list[str]
+
+    Returns
+    -------
+    dict[str, int]
+        the count of every distinct text, duplicates count every time
+    """
+    counts = Counter(xs)
+    distinct = list(counts)
+    joined = "\0".join(distinct)
+    starts = np.cumsum([0] + [len(x) + 1 for x in distinct]).tolist()
+
+    found = {}
+    for x in distinct:
+        total, at = 0, joined.find(x)
+        while at != -1:
+            # the text the match is in, carry on from the next one
+            i = bisect_right(starts, at) - 1
+            total += counts[distinct[i]]
+            at = joined.find(x, starts[i + 1])
+        found[x] = total
+    return found
 
 
 def scorer(xs):
     """
-    Calculate maximum score across texts
+    Calculate maximum score across texts, each text is scored by the
+    number of texts it is contained in (as a substring, so "pizza" counts
+    inside "pizzas")
 
     Parameters
     ----------
@@ -78,14 +166,18 @@ def scorer(xs):
     float
         maximum score across the list of texts
     """
-    score = (sum(i in j for j in xs) ** 2 * (1 + np.log(len(i.split()))) for i in xs)
-    return max(score)
+    scores = (
+        count ** 2 * (1 + np.log(len(x.split())))
+        for x, count in contained(xs).items()
+        if x.split()
+    )
+    return max(scores, default=0.0)
 
 
-# TODO make sure this works when 2 have the same number on the score
-def label(xs):
+def label(xs, ngrams=None):
     """
-    Pick the label that has the maximum score
+    Pick the word ngram that has the maximum score, ties go to the
+    ngram that appears first (by text, then length, then position)
 
     Parameters
     ----------
@@ -93,21 +185,23 @@ def label(xs):
         list of texts that will be processed and the
         highest score returned
 
+    ngrams : Table
+        precomputed ``table`` of the texts
+
     Returns
     -------
-    float
+    str
     """
-    ys = [j for i in xs for j in group(i)]
-    score = (sum(i == j for j in ys) ** 2 * (1 + np.log(len(i.split()))) for i in ys)
-    nScore = (i / len(ys) for i in score)
-    return ys[nScore == max(nScore)]
+    ids, df = table([x.split() for x in xs]) if ngrams is None else ngrams
+    words = list(ids)
+    gram = max(df, key=lambda gram: score(gram, df))
+    return " ".join(words[i] for i in gram)
 
 
-# TODO: this requires going over the list a couple of times, its pretty fast but
-#      could be better - if it becomes a resource hog then fix it
 # TODO: need to change score so that it stops counting against itself and the
 #      string it came from as this weighs words from long descriptions more
 
+
 # wordgram measurement
 def condition(xs):
     """
@@ -126,7 +220,7 @@ def condition(xs):
     return 0.0 if (len(xs_) <= 1) or (wordLen(xs_) < 3) else scorer(xs_)
 
 
-def selection(xs):
+def selection(xs, ngrams=None):
     """
     Selecting the text which has most similarity with all other texts
     through wordgram similarity
@@ -136,9 +230,12 @@ def selection(xs):
     xs : list[str]
         text to be selected from
 
+    ngrams : Table
+        precomputed ``table`` of the non empty texts
+
     Returns
     -------
     str
     """
     xs_ = strip(xs)
-    return label(xs_)
+    return label(xs_, ngrams)
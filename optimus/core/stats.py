@@ -0,0 +1,150 @@
+"""
+run statistics
+==============
+
+Timers, counters, histograms and peak memory of a run.
+
+A ``Stats`` object is handed down the pipeline and every stage adds to it:
+the stages of ``run`` time themselves, the selection tiers count how many
+groups they labelled and how long they took, and every depth records the
+sizes of its clusters. With a ``log`` path every stage is also appended to
+a JSON-lines file as soon as it completes.
+
+"""
+# stdlib
+import json
+import time
+import contextlib
+
+try:
+    import resource
+except ImportError:  # not on windows
+    resource = None
+
+# third party
+import numpy as np
+
+
+def rss():
+    """
+    Peak resident memory of the process so far
+
+    Returns
+    -------
+    int
+        bytes, 0 where it cannot be measured
+    """
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on linux
+
+
+class Stats:
+    """
+    Statistics collected during a run
+
+    Parameters
+    ----------
+    log : str
+        path of a JSON-lines file to append a record to as every stage
+        completes, ``None`` to only collect
+
+    Attributes
+    ----------
+    timers : dict[str, float]
+        seconds spent per name
+
+    counters : dict[str, int]
+
+    histograms : dict[str, dict[int, int]]
+        number of values per power of two bucket (lower bound)
+
+    peak : int
+        peak resident memory in bytes, as of the last record
+    """
+
+    def __init__(self, log=None):
+        self.log = log
+        self.timers = {}
+        self.counters = {}
+        self.histograms = {}
+        self.peak = 0
+
+    @contextlib.contextmanager
+    def timer(self, name, record=True, **fields):
+        """
+        Time a block and add it to the timer ``name``
+
+        Parameters
+        ----------
+        name : str
+
+        record : bool
+            whether to also log a record for the block
+
+        **fields
+            extra fields of the record (e.g. the depth)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timers[name] = self.timers.get(name, 0.0) + elapsed
+            if record:
+                self.record(stage=name, seconds=round(elapsed, 6), **fields)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def histogram(self, name, values, **fields):
+        """
+        Record the distribution of (positive integer) values, e.g. the
+        sizes of the clusters of a depth
+
+        Parameters
+        ----------
+        name : str
+
+        values : numpy.ndarray
+        """
+        buckets = np.bincount(np.log2(values).astype(int)) if len(values) else []
+        self.histograms[name] = {2 ** i: int(n) for i, n in enumerate(buckets) if n}
+        self.record(histogram=name, buckets=self.histograms[name], **fields)
+
+    def record(self, **fields):
+        """
+        Update the peak memory and log a record
+        """
+        self.peak = max(self.peak, rss())
+        if self.log:
+            with open(self.log, "a") as handle:
+                handle.write(json.dumps(dict(fields, peak=self.peak)) + "\n")
+
+    def merge(self, other):
+        """
+        Add the timers and counters of another ``Stats`` (e.g. from a worker)
+
+        Parameters
+        ----------
+        other : Stats
+        """
+        for name, seconds in other.timers.items():
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def summary(self):
+        """
+        Everything collected so far
+
+        Returns
+        -------
+        dict
+        """
+        return {
+            "timers": dict(self.timers),
+            "counters": dict(self.counters),
+            "histograms": dict(self.histograms),
+            "peak": self.peak,
+        }
@@ -1,108 +1,702 @@
 # stdlib
+import logging
+import itertools
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
 # third party
+import numpy as np
 import pandas as pd
-import fastText as ft
 
 # project
 from optimus.core import parse
-from optimus.core.embedding.fasttext import embed
-from optimus.core.cluster import cluster
+from optimus.core.cache import ParseCache, namespace
+from optimus.core.checkpoint import Checkpoint, digest
+from optimus.core.embedding.fasttext import Embedder, fingerprint
+from optimus.core.cluster import hierarchy, cut, unique
+from optimus.core.fitted import Fitted
 from optimus.core.select import select
+from optimus.core.stats import Stats
+from optimus.utils import intern
+
+logger = logging.getLogger(__name__)
 
-# TODO: REWRITE TIER NAMES, make the step size more granular
+# checkpointed stages
+parsed = ("keys.json", "codes.npy", "firsts.npy")
+linkage = ("links.npy", "leaves.npy", "linked.npy")
+
+# TODO: REWRITE TIER NAMES
 # TODO: step away from depth to iterations
 
 
-def run(data, model, depth=3, end_depth=15, stepsize=3, **thresholds):
+def chunks(data, chunksize=None):
+    """
+    Read the input in chunks of lines
+
+    Parameters
+    ----------
+    data : list[str] | str
+        list of strings or a string path to a text file
+
+    chunksize : int
+        number of lines per chunk, ``None`` for a single chunk
+
+    Returns
+    -------
+    generator
+        lists of lines, split like ``str.splitlines``
+    """
+    if not isinstance(data, str):
+        data = iter(data)
+        while True:
+            chunk = list(itertools.islice(data, chunksize))
+            if not chunk:
+                return
+            yield chunk
+
+    with open(data) as handle:
+        if chunksize is None:
+            yield handle.read().splitlines()
+            return
+        while True:
+            # every chunk ends on a newline, so splitting it is the same
+            # as splitting the whole file
+            chunk = "".join(itertools.islice(handle, chunksize))
+            if not chunk:
+                return
+            yield chunk.splitlines()
+
+
+def reusable(data):
+    """
+    The input in a form that can be read more than once, one shot
+    iterables (generators, etc.) are read into a list. An open text file
+    is split into lines like a path is (see ``chunks``), without line
+    endings
+
+    Parameters
+    ----------
+    data : iterable[str] | str
+        see ``chunks``
+
+    Returns
+    -------
+    list[str] | str
+    """
+    if hasattr(data, "read"):
+        return data.read().splitlines()
+    return list(data) if iter(data) is data else data
+
+
+def targets(data, chunksize=None, batch_size=1000, n_process=1, cache=None):
+    """
+    Clean and parse the input chunk by chunk into a compact intermediate:
+    the distinct targets and an int32 code per line
+
+    Parameters
+    ----------
+    data : list[str] | str
+        see ``chunks``
+
+    chunksize : int
+        see ``chunks``
+
+    batch_size : int
+        see optimus.core.parse.parse
+
+    n_process : int
+        see optimus.core.parse.parse
+
+    cache : optimus.core.cache.ParseCache
+        if given, only the texts that are not in the cache are parsed
+
+    Returns
+    -------
+    tuple[list[str], numpy.ndarray, numpy.ndarray]
+        the distinct targets in order of first appearance, the code of
+        every line and the first line of every target
+    """
+    cleaner, index = parse.cleaner(), {}
+    codes, firsts = array("i"), array("q")
+    for chunk in chunks(data, chunksize):
+        parser = parse.parse if cache is None else cache.parse
+        parsed = parser(
+            cleaner.clean_batch(chunk), batch_size=batch_size, n_process=n_process
+        )
+        for target in parsed:
+            code = index.setdefault(target, len(index))
+            if code == len(firsts):
+                firsts.append(len(codes))
+            codes.append(code)
+    return list(index), np.frombuffer(codes, np.int32), np.frombuffer(firsts, np.intp)
+
+
+def write(frame, output, header):
+    """
+    Append a chunk of results to a CSV or Parquet (``.parquet``) file
+
+    Parameters
+    ----------
+    frame : pandas.core.frame.DataFrame
+
+    output : str
+        path of the file
+
+    header : object
+        ``None`` for the first chunk, afterwards what the previous call
+        returned
+
+    Returns
+    -------
+    object
+        to be passed as ``header`` with the next chunk
+    """
+    if not output.endswith(".parquet"):
+        frame.to_csv(output, mode="a" if header else "w", header=not header)
+        return True
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(frame)
+    writer = header or pq.ParquetWriter(output, table.schema)
+    writer.write_table(table)
+    return writer
+
+
+def schedule(depth, end_depth, stepsize):
+    """
+    The depths from ``depth`` to ``end_depth`` (inclusive) by ``stepsize``
+
+    Parameters
+    ----------
+    depth : float
+
+    end_depth : float
+
+    stepsize : float
+        can be fractional
+
+    Returns
+    -------
+    list[float]
+        integers for integer arguments, otherwise rounded so that repeated
+        additions do not leave e.g. 0.30000000000000004
+    """
+    steps = int(np.floor((end_depth - depth) / stepsize + 1e-9)) + 1
+    return [round(depth + i * stepsize, 9) for i in range(max(steps, 0))]
+
+
+def count(depth, links):
+    """
+    Number of clusters a linkage is cut into at a depth, from its merge
+    heights alone: every merge at or below the depth removes one
+
+    Parameters
+    ----------
+    depth : float
+
+    links : numpy.ndarray
+        linkage matrix, merge heights in increasing order
+
+    Returns
+    -------
+    int
+    """
+    return len(links) + 1 - int(np.searchsorted(links[:, 2], depth, side="right"))
+
+
+def frame(chunk, rows, labels, strings, start=0):
+    """
+    The results of a chunk of lines, with a categorical column of labels
+    per depth sharing the string table
+
+    Parameters
+    ----------
+    chunk : list[str]
+        the original lines
+
+    rows : numpy.ndarray
+        the target of every line
+
+    labels : dict[str, numpy.ndarray]
+        label code of every target per column, ending with "current_labels"
+
+    strings : list[str]
+        the string table
+
+    start : int
+        index of the first line
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+    """
+    categories = pd.CategoricalDtype(pd.Index(strings, dtype=object))
+    dty = {
+        name: pd.Categorical.from_codes(values[rows], dtype=categories)
+        for name, values in labels.items()
+    }
+    dty["original"] = chunk
+    df = pd.DataFrame(dty, index=range(start, start + len(chunk)))
+    return df[[*labels][:-1] + ["original", "current_labels"]]
+
+
+def run(
+    data,
+    model,
+    depth=3,
+    end_depth=15,
+    stepsize=3,
+    target=None,
+    batch_size=1000,
+    n_process=1,
+    vector_cache=None,
+    backend="ward",
+    backend_options=None,
+    workers=1,
+    chunksize=None,
+    output=None,
+    parse_cache=None,
+    checkpoint=None,
+    fit=None,
+    metrics=None,
+    return_stats=False,
+    **thresholds,
+):
     """
     The main pipeline for optimus. All the parts for this can be found
     individually, but this function executes the optimus pipeline.
 
+    Lines are reduced to their distinct targets right after parsing and
+    every depth is computed on those, so apart from an int32 code per line
+    memory grows with the number of distinct targets. With ``chunksize``
+    the input is read, cleaned and parsed a chunk at a time and with
+    ``output`` the results are written out a chunk at a time as well.
+
     Parameters
     ----------
     data : list[str] | str
         can either be a list of strings to be processed or a string path
-        to the text file containing the data
+        to the text file containing the data. It is read twice (to parse
+        and to write the output), so other iterables are read into a list
+        first
 
-    model : fastText.FastText._FastText
+    model : fastText.FastText._FastText | Embedder
         fastText model to be used for embedding
-        in future other models will be supported
+        in future other models will be supported. An Embedder is used as
+        it is, so its caches carry over between runs
 
     depth : int
         the initial depth to start at for the cluster cut off
 
     end_depth : int
-        the final depth to stop at
+        the final depth to stop at, not below ``depth``
+
+    stepsize : float
+        the stepsize to increment by, can be fractional. Depths at which
+        the hierarchy has the same clusters as at the previous one are not
+        cut and labelled again (the number of clusters at a depth is read
+        off the merge heights), and once the labels can no longer change
+        before ``end_depth`` the remaining depths are copies of the last
+        one
+
+    target : int
+        number of clusters to aim for: once a depth would give at most
+        this many clusters, the hierarchy is cut at the lowest depth that
+        does instead, and the run stops there
+
+    batch_size : int
+        number of texts spacy parses together (see optimus.core.parse.parse)
+
+    n_process : int
+        number of processes spacy parses with
+
+    vector_cache : str
+        directory for an on-disk word vector cache shared between runs
+        (see optimus.core.embedding.fasttext.Embedder)
+
+    backend : str
+        clustering backend, "ward" (exact), "minibatch" (approximate,
+        memory bounded) or "sharded", see optimus.core.cluster.hierarchy
+
+    backend_options : dict
+        options of the clustering backend, e.g. the number of shards. They
+        are part of the checkpoint digest, apart from an ``executor`` that
+        only decides where the work runs
+
+    workers : int
+        number of processes labels are selected with, the labels do not
+        depend on it (see optimus.core.select.select)
 
-    stepsize : int
-        the stepsize to increment by
+    chunksize : int
+        number of input lines to read and parse at a time, by default the
+        whole input is read at once
+
+    output : str
+        path of a CSV (or ``.parquet``) file to write the results to, a
+        chunk at a time, instead of returning them
+
+    parse_cache : str | optimus.core.cache.ParseCache
+        path of an SQLite file caching parse results between runs
+        (see optimus.core.cache.ParseCache), or an open cache which is
+        left open
+
+    checkpoint : str
+        directory to save every completed stage to. A run with the same
+        data, models and parameters carries on from its last completed
+        stage (see optimus.core.checkpoint)
+
+    fit : str
+        directory to save the centroids and labels of the clusters of every
+        depth to, so that new lines can be labelled with ``update``
+        (see optimus.core.fitted)
+
+    metrics : str
+        path of a JSON-lines file to append a record to as every stage
+        completes (see optimus.core.stats.Stats)
+
+    return_stats : bool
+        also return the statistics of the run: time per stage and per
+        selection tier, groups per tier, cluster sizes and peak memory
 
     **thresholds
         the thresholds that a user can provide to the pipeline
         for label selection. See the docs for optimus.core.select
-        valid: edits, wordgram, chargram, hypernym
+        valid: edit, wordgram, chargram, hypernym, edit_limit
 
     Returns
     -------
-    pandas.core.frame.DataFrame
+    pandas.core.frame.DataFrame | str
         pandas dataframe with original results and the different iterations
-        optimus
+        optimus, or the ``output`` path. With ``return_stats`` a tuple of
+        that and an optimus.core.stats.Stats
     """
+    depths = schedule(depth, end_depth, stepsize) if stepsize > 0 else []
+    if not depths:
+        raise ValueError(f"no depths from {depth} to {end_depth} by {stepsize}")
 
-    # prepare final dict
-    labels = {}
+    stats = Stats(log=metrics)
+    data = reusable(data)
+    backend_options = backend_options or {}
 
-    # overwrite data if filepath string is provided
-    if isinstance(data, str):
-        with open(data) as handle:
-            data = handle.read().splitlines()
+    # prepare final dict, depth -> label code of every distinct target, and
+    # the depths past a fixed point that are copies of an earlier one
+    labels, aliases = {}, {}
+
+    ck = checkpoint and Checkpoint(
+        checkpoint,
+        digest(
+            data,
+            fingerprint(model),
+            namespace(),
+            depth=depth,
+            end_depth=end_depth,
+            stepsize=stepsize,
+            target=target,
+            backend=backend,
+            backend_options={
+                name: value
+                for name, value in backend_options.items()
+                if name != "executor"
+            },
+            thresholds=thresholds,
+        ),
+    )
 
     # parse the data
-    print("[START] Autobots, roll out!")
-    print("    -- parsing")
-    target = list(parse.parse(parse.default_cleanerM(data)))
-    targetM = target.copy()  # mutable target
+    logger.info("Autobots, roll out!")
+    if ck and ck.has("firsts.npy"):
+        logger.info("loading parsed targets")
+        keys, codes, firsts = [ck.load(name) for name in parsed]
+    else:
+        logger.info("parsing")
+        opened = isinstance(parse_cache, str)
+        cache = ParseCache(parse_cache) if opened else parse_cache
+        hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+        with stats.timer("parse"):
+            keys, codes, firsts = targets(data, chunksize, batch_size, n_process, cache)
+        if cache:
+            hits, misses = cache.hits - hits, cache.misses - misses
+            logger.info(f"parse cache: {hits} hits, {misses} misses")
+            stats.count("parse.cache.hits", hits)
+            stats.count("parse.cache.misses", misses)
+        if opened:
+            cache.close()
+        if ck:
+            for name, value in zip(parsed, (keys, codes, firsts)):
+                ck.save(name, value)
+    stats.count("lines", len(codes))
+    stats.count("targets", len(keys))
+
+    # every string (targets and labels) is interned once into ``strings``
+    # and referred to by its int32 code from then on
+    index = {}
+    strings, _ = intern(keys, index)
+    current = np.arange(len(keys), dtype=np.int32)  # code of the current target
 
     # get number of initial clusters
-    numclusters = len(target)
+    numclusters = len(codes)
 
-    # embed
-    print("    -- embedding")
-    embeddings = list(embed(targetM, model))
+    embedder = (
+        model if isinstance(model, Embedder) else Embedder(model, path=vector_cache)
+    )
 
-    # cluster
-    print("    -- clustering")
-    clusters = cluster(embeddings, depth)
+    # the linkage only depends on the targets, so it is computed once and
+    # cut at every depth until the labelling changes the targets. Only the
+    # distinct targets are clustered, weighted by how often they occur.
+    links, leaves, linked = None, None, None
+    embedding, rows, clusters = None, None, None
+
+    # lines per target
+    lines = np.bincount(codes, minlength=len(keys))
+    fitted = fit and Fitted(fingerprint=fingerprint(model))
+
+    if ck and ck.has("state.json"):
+        state = ck.load("state.json")
+        logger.info(f"resuming after depth {state['depth']}")
+        strings, _ = intern(state["strings"], index)
+        labels = {f"{d}": ck.load(f"labels-{d}.npy") for d in state["depths"]}
+        aliases = state.get("aliases", {})
+        labels.update((name, labels[source]) for name, source in aliases.items())
+        current = ck.load(f"current-{state['depth']}.npy")
+        numclusters = state["numclusters"]
+        if ck.has("linked.npy"):
+            links, leaves, linked = [ck.load(name) for name in linkage]
+        for name in state["depths"] if fitted else ():
+            fitted.restore(ck, name)
+        for name, source in aliases.items() if fitted else ():
+            fitted.alias(name, source)
+        depths = [] if state.get("final") else [d for d in depths if d > state["depth"]]
+
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
 
     # main loop
-    while depth <= end_depth:
-        print(f"** Depth {depth}")
-        print("    -- embedding")
-        embedding = list(embed(targetM, model))
+    fixed, final = False, False
+    for depth in depths:
+        logger.info(f"depth {depth}")
+        if not np.array_equal(current, linked):
+            logger.info("embedding")
+            distinct, rows = intern(current.tolist())
+            with stats.timer("embed", depth=depth):
+                if ck and ck.has("embedded.npy") and np.array_equal(
+                    ck.load("embedded.npy"), current
+                ):
+                    embedding = ck.load("embedding.npy")
+                else:
+                    embedding = embedder([strings[code] for code in distinct])
+                    if ck:
+                        ck.save("embedding.npy", embedding)
+                        ck.save("embedded.npy", current)
+
+            logger.info("clustering")
+            with stats.timer("cluster", depth=depth):
+                weights = np.bincount(rows[codes], minlength=len(distinct))
+                uniques, inverse, counts = unique(embedding, weights)
+                links, leaves = hierarchy(
+                    uniques, counts, backend=backend, **backend_options
+                )
+                leaves, linked = leaves[inverse[rows]], current
+            if ck:
+                # ``linked`` last: a linkage is only reused if it matches
+                for name, value in zip(linkage, (links, leaves, linked)):
+                    ck.save(name, value)
+        else:
+            logger.info("reusing linkage")
+            if fitted and embedding is None:  # resumed with a saved linkage
+                distinct, rows = intern(linked.tolist())
+                embedding = embedder([strings[code] for code in distinct])
 
-        print("    -- clustering")
-        clusters = cluster(embedding, depth)
+        if target and count(depth, links) <= target:
+            # the lowest depth with at most ``target`` clusters
+            merges = len(links) + 1 - target
+            if merges > 0:  # rounded like ``schedule`` for the column name
+                depth = round(float(links[merges - 1, 2]), 9)
+            logger.info(f"{target} clusters at depth {depth}")
+            final = True
 
-        if len(set(clusters)) == numclusters:
-            print("    >> No new clusters generated")
-            labels[f"{depth}"] = labels[f"{depth-stepsize}"]
+        if labels and count(depth, links) == numclusters:
+            logger.info("no new clusters generated")
+            stats.count("depths.skipped")
+            if clusters is None:  # resumed
+                clusters = cut(depth, links, leaves)
+            labels[f"{depth}"] = labels[[*labels][-1]]
         else:
-            numclusters = len(set(clusters))
+            stats.count("depths.evaluated")
+            clusters = cut(depth, links, leaves)
+            numclusters = count(depth, links)
+
+            logger.info("generating labels")
+            with stats.timer("select", depth=depth):
+                texts = [strings[code] for code in current[codes]]
+                table, selected = select(
+                    texts,
+                    clusters[codes],
+                    executor=executor,
+                    coded=True,
+                    stats=stats,
+                    **thresholds,
+                )
+                strings, ids = intern(table, index)
+                labels[f"{depth}"] = ids.astype(np.int32)[selected[firsts]]
+                empty = index.get("", -1)
+                current = np.where(
+                    labels[f"{depth}"] == empty, current, labels[f"{depth}"]
+                )
+
+        sizes = np.bincount(clusters[codes])
+        stats.histogram(f"clusters.{depth}", sizes[sizes > 0], depth=depth)
+
+        if fitted:
+            # ``rows`` maps the targets the linkage was built on to ``embedding``
+            fitted.add(depth, embedding[rows], clusters, lines, labels[f"{depth}"])
+
+        if not final and np.array_equal(current, linked):
+            # the targets are clustered already and no merge is left before
+            # the last depth, so every depth from here on is the same
+            fixed = count(depths[-1], links) == numclusters
+            if fixed:
+                logger.info(f"labels reached a fixed point at depth {depth}")
+                for rest in depths[depths.index(depth) + 1 :]:
+                    aliases[f"{rest}"] = f"{depth}"
+                    labels[f"{rest}"] = labels[f"{depth}"]
+                    if fitted:
+                        fitted.alias(rest, depth)
+                    stats.count("depths.skipped")
+
+        if ck:
+            if fitted:
+                fitted.dump(ck, f"{depth}")
+            ck.save(f"labels-{depth}.npy", labels[f"{depth}"])
+            ck.save(f"current-{depth}.npy", current)
+            names = [name for name in labels if name not in aliases]
+            state = dict(depth=depth, depths=names, numclusters=numclusters)
+            state.update(final=final or fixed, aliases=aliases, strings=strings)
+            ck.save("state.json", state)
 
-            print("    -- generating labels")
-            labels[f"{depth}"] = list(select(targetM, clusters))
-            targetM = [i if i else j for i, j in zip(labels[f"{depth}"], targetM)]
+        if final or fixed:
+            break
 
-        depth += stepsize
+    if executor is not None:
+        executor.shutdown()
+
+    if fitted:
+        fitted.strings = strings
+        fitted.save(fit)
+
+    # make the output match optimus, the label columns are categoricals
+    # sharing the string table
+    labels["current_labels"] = labels[[*labels][-1]]
+
+    frames, header, start = [], None, 0
+    with stats.timer("output"):
+        for chunk in chunks(data, chunksize):
+            df = frame(chunk, codes[start : start + len(chunk)], labels, strings, start)
+            start += len(chunk)
+
+            if output is None:
+                frames.append(df)
+            else:
+                header = write(df, output, header)
+
+        if output is not None and output.endswith(".parquet") and header:
+            header.close()
+    stats.record(summary=stats.summary())
+
+    result = pd.concat(frames) if output is None else output
+    return (result, stats) if return_stats else result
+
+
+def update(
+    data,
+    model,
+    fit,
+    history=None,
+    drift=0.1,
+    batch_size=1000,
+    n_process=1,
+    parse_cache=None,
+    **options,
+):
+    """
+    Label new lines with the clusters a run was fitted with (see the
+    ``fit`` option of ``run``) instead of clustering everything again.
+
+    Every line is parsed, embedded and given the label of its nearest
+    cluster at every depth. When more than ``drift`` of the lines are
+    outside the fitted clusters (see optimus.core.fitted) and the
+    ``history`` the model was fitted on is given, the history and the new
+    lines are run again and the model is fitted again.
+
+    Parameters
+    ----------
+    data : list[str] | str
+        the new lines, a list of strings or a path to a text file (see
+        ``run``)
+
+    model : fastText.FastText._FastText | Embedder
+        the fastText model the run was fitted with
+
+    fit : str
+        directory of the fitted model
+
+    history : list[str] | str
+        the lines the model was fitted on
+
+    drift : float
+        share of lines outside the fitted clusters above which the model
+        is fitted again
+
+    batch_size : int
+        see ``run``
+
+    n_process : int
+        see ``run``
+
+    parse_cache : str | optimus.core.cache.ParseCache
+        see ``run``
+
+    **options
+        passed on to ``run`` when fitting again (depths, thresholds, etc.)
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        the same columns as ``run`` gives
+    """
+    fitted = Fitted.load(fit)
+    if fitted.fingerprint != fingerprint(model):
+        raise ValueError(f"{fit} was fitted with another embedding model")
+    data = reusable(data)
 
-    # make the output match optimus
-    dty = labels
-    dty["original"] = data
-    dty["current_labels"] = dty[f"{end_depth}"]
+    opened = isinstance(parse_cache, str)
+    cache = ParseCache(parse_cache) if opened else parse_cache
+    keys, codes, _ = targets(data, None, batch_size, n_process, cache)
+    if opened:
+        cache.close()
 
-    df = pd.DataFrame.from_dict(dty, orient="index").transpose()
+    embedder = model if isinstance(model, Embedder) else Embedder(model)
+    strings, labels, outside = fitted.assign(keys, embedder)
+    share = outside[codes].mean() if len(codes) else 0.0
+    logger.info(f"{share:.1%} of the lines are outside the fitted clusters")
 
-    # reordering to match optimus
-    df_ = df[[df.columns[-2], *list(df.columns[:-3]), df.columns[-1]]]
+    lines = [line for chunk in chunks(data) for line in chunk]
+    if share > drift and history is not None:
+        logger.info("fitting again")
+        history = [line for chunk in chunks(history) for line in chunk]
+        result = run(
+            history + lines,
+            model,
+            batch_size=batch_size,
+            n_process=n_process,
+            parse_cache=parse_cache,
+            fit=fit,
+            **options,
+        )
+        return result.iloc[len(history) :].set_index(pd.RangeIndex(len(lines)))
+    if share > drift:
+        logger.warning("the lines have drifted, but there is no history to refit")
 
-    return df
+    labels["current_labels"] = labels[fitted.depths[-1]]
+    return frame(lines, codes, labels, strings)
@@ -0,0 +1,415 @@
+"""
+labelling service
+=================
+
+Long-lived labelling server that keeps the models resident, so requests do
+not pay the cost of loading fastText, spacy and wordnet.
+
+Requests are JSON over HTTP/1.1 on a local TCP port or a Unix socket:
+
+- ``POST /parse`` with ``{"lines": [...]}`` gives ``{"targets": [...]}``,
+  the parse result of every line
+- ``POST /label`` with ``{"lines": [...]}`` runs ``optimus.optimus.run`` on
+  the lines and gives ``{"labels": [...]}``, a record per line
+- ``GET /stats`` gives the statistics of the service so far
+
+Requests are micro-batched: the lines of all the requests that arrive
+within ``delay`` seconds of each other (up to ``batch`` lines) are cleaned
+and parsed in one ``nlp.pipe`` and their targets embedded in one batch.
+The results go into the resident parse cache and embedder that every
+``run`` of the batch then reads from.
+
+Start a server with::
+
+    python -m optimus.service wiki.en.bin [--port 8000 | --unix optimus.sock]
+
+"""
+# stdlib
+import sys
+import json
+import asyncio
+import logging
+import argparse
+
+from concurrent.futures import ThreadPoolExecutor
+
+# project
+from optimus.core import models
+from optimus.core import parse
+from optimus.core.cache import ParseCache
+from optimus.core.embedding.fasttext import Embedder
+from optimus.core.stats import Stats
+from optimus.optimus import run
+
+logger = logging.getLogger(__name__)
+
+# HTTP status lines by code
+statuses = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Server Error"}
+
+
+class Service:
+    """
+    Micro-batching labelling service around resident models
+
+    All the work happens on a single worker thread, so the event loop keeps
+    accepting requests (and queueing the next batch) while a batch runs.
+
+    Parameters
+    ----------
+    model : fastText.FastText._FastText
+        loaded fastText model
+
+    batch : int
+        maximum number of lines in a batch
+
+    delay : float
+        seconds to wait for more requests once the first one of a batch
+        has arrived
+
+    parse_cache : str
+        SQLite file of the resident parse cache, in memory by default
+        (see optimus.core.cache.ParseCache)
+
+    cache_size : int
+        number of parse results the resident parse cache keeps, the oldest
+        are dropped first. ``None`` keeps everything, e.g. for an on-disk
+        cache shared with other runs
+
+    vector_cache : str
+        directory of an on-disk word vector cache
+        (see optimus.core.embedding.fasttext.Embedder)
+
+    **options
+        passed on to every ``run`` (depths, backend, thresholds)
+    """
+
+    def __init__(
+        self,
+        model,
+        batch=1000,
+        delay=0.005,
+        parse_cache=":memory:",
+        cache_size=100000,
+        vector_cache=None,
+        **options,
+    ):
+        self.batch, self.delay, self.options = batch, delay, options
+        self.embedder = Embedder(model, path=vector_cache)
+        self.path, self.cache = parse_cache, None
+        self.cache_size, self.pruned = cache_size, 0
+        self.stats = Stats()
+        self.executor = ThreadPoolExecutor(1)
+        self.queue = None
+
+    def warmup(self):
+        """
+        Load the models and open the parse cache on the worker thread
+        (an SQLite connection can only be used from the thread it was
+        opened on)
+        """
+        models.warmup()
+        self.cache = ParseCache(self.path)
+
+    async def start(self):
+        """
+        Warm up and start batching, in the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.warmup)
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.ensure_future(self.batches())
+
+    async def stop(self):
+        self.batcher.cancel()
+        await asyncio.gather(self.batcher, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.cache.close
+        )
+        self.executor.shutdown()
+
+    async def submit(self, kind, lines):
+        """
+        Queue a request and wait for its result
+
+        Parameters
+        ----------
+        kind : str
+            "parse" or "label"
+
+        lines : list[str]
+
+        Returns
+        -------
+        list
+            a target or a label record per line
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((kind, lines, future))
+        return await future
+
+    async def batches(self):
+        """
+        Collect requests into batches and run them one after the other
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            size = len(pending[0][1])
+            deadline = loop.time() + self.delay
+            while size < self.batch:
+                try:
+                    timeout = max(deadline - loop.time(), 0)
+                    pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(pending[-1][1])
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.process, [(k, ls) for k, ls, _ in pending]
+                )
+            except Exception as error:
+                logger.exception("batch failed")
+                results = [error] * len(pending)
+            for (_, _, future), result in zip(pending, results):
+                if future.done():  # the client went away
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def process(self, requests):
+        """
+        Run a batch of requests, on the worker thread
+
+        Parameters
+        ----------
+        requests : list[tuple[str, list[str]]]
+            kind and lines of every request
+
+        Returns
+        -------
+        list
+            the result of every request, or the exception it raised
+        """
+        lines = [line for _, ls in requests for line in ls]
+        with self.stats.timer("service.batch", record=False):
+            # one nlp.pipe and one embedding batch for every line of the batch
+            cleaned = parse.cleaner().clean_batch(lines)
+            found = self.cache.parse(cleaned)
+            self.embedder(list(dict.fromkeys(found)))
+
+            results, start = [], 0
+            for kind, ls in requests:
+                try:
+                    if kind == "parse":
+                        results.append(found[start : start + len(ls)])
+                    else:
+                        results.append(self.label(ls))
+                except Exception as error:
+                    results.append(error)
+                start += len(ls)
+
+        self.stats.count("service.batches")
+        self.stats.count("service.requests", len(requests))
+        self.stats.count("service.lines", len(lines))
+
+        # every miss was stored, prune once a tenth of the size was added
+        if (
+            self.cache_size is not None
+            and self.cache.misses - self.pruned > self.cache_size // 10
+        ):
+            self.cache.prune(self.cache_size)
+            self.pruned = self.cache.misses
+        return results
+
+    def label(self, lines):
+        """
+        Label the lines of a request with ``run``
+
+        Returns
+        -------
+        list[dict[str, str]]
+            a record per line: the label of every depth, the original line
+            and the current label
+        """
+        if not lines:
+            return []
+        frame = run(lines, self.embedder, parse_cache=self.cache, **self.options)
+        return frame.astype(str).to_dict("records")
+
+
+async def respond(writer, code, body):
+    payload = json.dumps(body).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {code} {statuses[code]}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii") + payload
+    )
+    await writer.drain()
+
+
+async def handle(service, reader, writer):
+    """
+    Serve the HTTP requests of a (keep-alive) connection
+    """
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            method, path, _ = line.decode("ascii").split(" ", 2)
+            headers = {}
+            while True:
+                header = (await reader.readline()).decode("latin-1").strip()
+                if not header:
+                    break
+                name, _, value = header.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            if method == "GET" and path == "/stats":
+                await respond(writer, 200, service.stats.summary())
+                continue
+            if method != "POST" or path not in ("/parse", "/label"):
+                await respond(writer, 404, {"error": f"{method} {path}"})
+                continue
+            try:
+                lines = json.loads(body)["lines"]
+                assert isinstance(lines, list)
+                assert all(isinstance(line, str) for line in lines)
+            except (ValueError, KeyError, TypeError, AssertionError):
+                await respond(writer, 400, {"error": 'expected {"lines": [str]}'})
+                continue
+
+            kind = path[1:]
+            try:
+                result = await service.submit(kind, lines)
+            except Exception as error:
+                await respond(writer, 500, {"error": repr(error)})
+                continue
+            key = "targets" if kind == "parse" else "labels"
+            await respond(writer, 200, {key: result})
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        return
+    finally:
+        writer.close()
+
+
+async def serve(service, host="127.0.0.1", port=8000, unix=None):
+    """
+    Start a service and serve it until cancelled
+
+    Parameters
+    ----------
+    service : Service
+
+    host : str
+
+    port : int
+
+    unix : str
+        path of a Unix socket to listen on instead of the TCP port
+    """
+    await service.start()
+    callback = lambda reader, writer: handle(service, reader, writer)
+    if unix:
+        server = await asyncio.start_unix_server(callback, unix)
+    else:
+        server = await asyncio.start_server(callback, host, port)
+    logger.info(f"listening on {unix or f'{host}:{port}'}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+async def connect(host="127.0.0.1", port=8000, unix=None):
+    """
+    Open a connection to a service
+
+    Returns
+    -------
+    tuple[asyncio.StreamReader, asyncio.StreamWriter]
+    """
+    if unix:
+        return await asyncio.open_unix_connection(unix)
+    return await asyncio.open_connection(host, port)
+
+
+async def call(connection, method, path, body=None):
+    """
+    Make a request over a connection to a service
+
+    Parameters
+    ----------
+    connection : tuple[asyncio.StreamReader, asyncio.StreamWriter]
+        see ``connect``
+
+    method : str
+
+    path : str
+
+    body : object
+        JSON serialisable body
+
+    Returns
+    -------
+    tuple[int, object]
+        the status code and the decoded body of the response
+    """
+    reader, writer = connection
+    payload = b"" if body is None else json.dumps(body).encode("utf-8")
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: optimus\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii") + payload
+    )
+    await writer.drain()
+
+    code = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        header = (await reader.readline()).decode("latin-1").strip()
+        if not header:
+            break
+        name, _, value = header.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return code, json.loads(await reader.readexactly(int(headers["content-length"])))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("model", help="path of the fastText model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix", help="serve on a Unix socket instead")
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--delay", type=float, default=0.005)
+    parser.add_argument("--parse-cache", default=":memory:")
+    parser.add_argument("--cache-size", type=int, default=100000)
+    parser.add_argument("--vector-cache")
+    args = parser.parse_args(arguments)
+
+    # third party
+    import fastText as ft
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    logger.info("Loading fastText model")
+    service = Service(
+        ft.load_model(args.model),
+        batch=args.batch,
+        delay=args.delay,
+        parse_cache=args.parse_cache,
+        cache_size=args.cache_size,
+        vector_cache=args.vector_cache,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
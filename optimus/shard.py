@@ -0,0 +1,489 @@
+"""
+sharded runs
+============
+
+Run optimus over inputs too large for one process (or one machine) by
+splitting the expensive stages into shards.
+
+1. the distinct cleaned lines are split into shards by a hash of the text
+   and every shard is parsed by a worker
+2. the distinct targets are split into shards by a hash of the parsed
+   keyword and every shard is embedded by a worker
+3. ``optimus.optimus.run`` carries on from the parse and vector caches the
+   shards were collected into, with the ``sharded`` clustering backend:
+   every shard of the embedding is clustered on its own and the centroids
+   of the shards are merged with a final weighted ward linkage, so the
+   depth cut offs are the same across shards
+   (see optimus.core.cluster.sharded)
+
+The shards of the first two stages go through a work queue in a directory.
+Any number of workers can take tasks from it, in local processes started
+by ``run`` or on other hosts that share the directory::
+
+    python -m optimus.shard queue/ wiki.en.bin
+
+"""
+# stdlib
+import os
+import sys
+import json
+import time
+import zlib
+import uuid
+import logging
+import argparse
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+# third party
+import numpy as np
+
+# project
+from optimus.core import parse
+from optimus.core.cache import ParseCache
+from optimus.core.checkpoint import Checkpoint
+from optimus.core.embedding.fasttext import Embedder
+from optimus.optimus import chunks, reusable
+from optimus.optimus import run as run_
+
+logger = logging.getLogger(__name__)
+
+
+class Queue:
+    """
+    Work queue in a directory
+
+    A task is a JSON file in ``tasks/``. A worker claims it by moving it to
+    ``claimed/``, which only one worker can do, and saves the result of the
+    task (an array, anything else as JSON, or the error it raised) to
+    ``results/``, moved in place once it is complete
+    (see optimus.core.checkpoint.Checkpoint).
+
+    A claim is a lease: a task that has no result ``lease`` seconds after
+    it was claimed (its worker ran out of memory, its host went away) is
+    moved back to ``tasks/`` for another worker.
+
+    Parameters
+    ----------
+    path : str
+        the directory, created if it does not exist
+
+    lease : float
+        seconds a worker has for a task, longer than any task takes
+    """
+
+    def __init__(self, path, lease=600.0):
+        self.path, self.lease = path, lease
+        for name in ("tasks", "claimed"):
+            os.makedirs(os.path.join(path, name), exist_ok=True)
+        self.results = Checkpoint(path, "results")
+
+    def put(self, name, task):
+        """
+        Add a task
+
+        Parameters
+        ----------
+        name : str
+            unique name of the task
+
+        task : dict
+            JSON serialisable task, with a "kind" (see ``tasks``)
+        """
+        path = os.path.join(self.path, "tasks", name)
+        with open(path + ".tmp", "w") as handle:
+            json.dump(task, handle)
+        os.replace(path + ".tmp", path + ".json")
+
+    def pending(self):
+        """
+        Number of tasks waiting for a worker
+        """
+        entries = os.listdir(os.path.join(self.path, "tasks"))
+        return sum(entry.endswith(".json") for entry in entries)
+
+    def claim(self):
+        """
+        Claim a task, after handing back the tasks with an expired lease
+
+        Returns
+        -------
+        tuple[str, dict] | None
+            the name and the task, ``None`` once no task is left
+        """
+        self.expire()
+        for entry in sorted(os.listdir(os.path.join(self.path, "tasks"))):
+            if not entry.endswith(".json"):
+                continue
+            claimed = os.path.join(self.path, "claimed", entry)
+            try:
+                os.rename(os.path.join(self.path, "tasks", entry), claimed)
+            except FileNotFoundError:  # claimed by another worker
+                continue
+            os.utime(claimed)  # the lease starts now
+            with open(claimed) as handle:
+                return entry[: -len(".json")], json.load(handle)
+        return None
+
+    def finish(self, name, suffix, result):
+        """
+        Save the result of a claimed task and release the claim
+
+        Parameters
+        ----------
+        name : str
+
+        suffix : str
+            "npy" for an array, "json" or "error"
+
+        result : numpy.ndarray | object
+        """
+        self.results.save(f"{name}.{suffix}", result)
+        try:
+            os.remove(os.path.join(self.path, "claimed", f"{name}.json"))
+        except FileNotFoundError:  # the lease expired and was claimed again
+            pass
+
+    def expire(self):
+        """
+        Move the claimed tasks with an expired lease back to ``tasks/``
+        """
+        now = time.time()
+        for entry in os.listdir(os.path.join(self.path, "claimed")):
+            claimed = os.path.join(self.path, "claimed", entry)
+            try:
+                if now - os.path.getmtime(claimed) > self.lease:
+                    logger.warning(f"lease of task {entry} expired")
+                    os.rename(claimed, os.path.join(self.path, "tasks", entry))
+            except FileNotFoundError:  # finished or expired by another worker
+                continue
+
+    def wait(self, names, interval=0.1, timeout=None, poll=None):
+        """
+        Wait for the results of tasks
+
+        Parameters
+        ----------
+        names : list[str]
+
+        interval : float
+            seconds between checks
+
+        timeout : float
+            seconds to wait for the next result, ``None`` to wait forever
+
+        poll : function
+            called between checks, e.g. to start workers for tasks that
+            were handed back
+
+        Returns
+        -------
+        list
+            the result of every task
+
+        Raises
+        ------
+        RuntimeError
+            if a task failed
+
+        TimeoutError
+            if no result came in for ``timeout`` seconds
+        """
+        found, last = [], time.monotonic()
+        for name in names:
+            while True:
+                done = [
+                    f"{name}.{suffix}"
+                    for suffix in ("npy", "json", "error")
+                    if self.results.has(f"{name}.{suffix}")
+                ]
+                if done:
+                    break
+                if timeout is not None and time.monotonic() - last > timeout:
+                    raise TimeoutError(f"no result for task {name} in {timeout}s")
+                self.expire()
+                if poll is not None:
+                    poll()
+                time.sleep(interval)
+            if done[0].endswith(".error"):
+                error = self.results.load(done[0])
+                raise RuntimeError(f"task {name} failed: {error}")
+            found.append(self.results.load(done[0]))
+            last = time.monotonic()
+        return found
+
+    def remove(self, names):
+        """
+        Remove every file of tasks, once their results were collected
+
+        Parameters
+        ----------
+        names : list[str]
+        """
+        for name in names:
+            paths = [
+                os.path.join(self.path, folder, f"{name}.json")
+                for folder in ("tasks", "claimed")
+            ]
+            paths += [
+                os.path.join(self.results.path, f"{name}.{suffix}")
+                for suffix in ("npy", "json", "error")
+            ]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def parse_shard(texts, model):
+    """
+    Parse a shard of distinct cleaned texts
+
+    Returns
+    -------
+    list[str]
+        the target of every text
+    """
+    return list(parse.parse(texts))
+
+
+def embed_shard(texts, model):
+    """
+    Embed a shard of distinct targets
+
+    Returns
+    -------
+    numpy.ndarray
+        float32 array with a row per target
+    """
+    return Embedder(model)(texts)
+
+
+# task kind -> function(payload, model)
+tasks = {"parse": parse_shard, "embed": embed_shard}
+
+
+def work(path, model, lease=600.0):
+    """
+    Take tasks from a queue until it is empty
+
+    Parameters
+    ----------
+    path : str
+        directory of the queue
+
+    model : fastText.FastText._FastText
+        loaded fastText model
+
+    lease : float
+        seconds a worker has for a task (see ``Queue``)
+    """
+    queue = Queue(path, lease)
+    while True:
+        claimed = queue.claim()
+        if claimed is None:
+            return
+        name, task = claimed
+        logger.info(f"running task {name}")
+        try:
+            result = tasks[task["kind"]](task["payload"], model)
+        except Exception as error:
+            logger.exception(f"task {name} failed")
+            queue.finish(name, "error", repr(error))
+            continue
+        suffix = "npy" if isinstance(result, np.ndarray) else "json"
+        queue.finish(name, suffix, result)
+
+
+def split(keys, shards):
+    """
+    Split strings into shards by a hash of the string
+
+    Parameters
+    ----------
+    keys : list[str]
+
+    shards : int
+
+    Returns
+    -------
+    list[list[str]]
+    """
+    parts = [[] for _ in range(shards)]
+    for key in keys:
+        parts[zlib.crc32(key.encode("utf-8")) % shards].append(key)
+    return parts
+
+
+def stage(queue, kind, parts, workers, model, timeout=None):
+    """
+    Queue a task per shard, work through them with local processes
+    (next to any remote workers) and collect the results. Local workers
+    exit once the queue is empty, new ones are started for tasks that were
+    handed back after a lost lease.
+
+    Returns
+    -------
+    list
+        the result of every non empty shard
+    """
+    names, key = [], uuid.uuid4().hex[:8]
+    for i, part in enumerate(parts):
+        if part:
+            queue.put(f"{kind}-{key}-{i}", dict(kind=kind, payload=part))
+            names.append(f"{kind}-{key}-{i}")
+    if not names:
+        return []
+
+    # forked workers share the loaded model with the driver
+    context = multiprocessing.get_context("fork")
+    processes = []
+
+    def poll():
+        processes[:] = [process for process in processes if process.is_alive()]
+        for _ in range(min(workers - len(processes), queue.pending())):
+            process = context.Process(
+                target=work, args=(queue.path, model, queue.lease)
+            )
+            process.start()
+            processes.append(process)
+
+    try:
+        poll()
+        results = queue.wait(names, timeout=timeout, poll=poll)
+        # copied out of the result files before they are removed
+        return [np.array(r) if isinstance(r, np.ndarray) else r for r in results]
+    except BaseException:
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+        queue.remove(names)
+
+
+def run(
+    data,
+    model,
+    path,
+    shards=4,
+    workers=4,
+    resolution=0.5,
+    backend="sharded",
+    timeout=3600.0,
+    lease=600.0,
+    **options,
+):
+    """
+    ``optimus.optimus.run`` with parsing, embedding and clustering split
+    into shards, see the module docs
+
+    Parameters
+    ----------
+    data : list[str] | str
+        see ``optimus.optimus.run``
+
+    model : fastText.FastText._FastText
+        see ``optimus.optimus.run``
+
+    path : str
+        working directory for the queue and the caches
+
+    shards : int
+        number of shards of every stage
+
+    workers : int
+        number of local worker processes, 0 to only wait for workers on
+        other hosts
+
+    resolution : float
+        depth the clustering shards are cut at before merging, at most the
+        first depth (see optimus.core.cluster.sharded)
+
+    backend : str
+        "sharded", or any other backend to only shard parsing and embedding
+
+    timeout : float
+        seconds to wait for the next shard of a stage before giving up,
+        e.g. when ``workers`` is 0 and no other host works on the queue
+
+    lease : float
+        seconds a worker has for a task before it is handed to another
+        one, remote workers should be started with the same ``--lease``
+
+    **options
+        passed on to ``optimus.optimus.run``
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame | str
+        see ``optimus.optimus.run``
+    """
+    data = reusable(data)
+    queue = Queue(os.path.join(path, "queue"), lease)
+    cleaner, cache = parse.cleaner(), ParseCache(os.path.join(path, "parses.db"))
+    texts = list(
+        dict.fromkeys(
+            text for chunk in chunks(data) for text in cleaner.clean_batch(chunk)
+        )
+    )
+
+    # only what is not in the caches yet goes to the workers
+    found = cache.get(texts)
+    texts = [text for text in texts if text not in found]
+    logger.info(f"parsing {len(texts)} texts in {shards} shards")
+    parts = [part for part in split(texts, shards) if part]
+    results = stage(queue, "parse", parts, workers, model, timeout)
+    for part, targets in zip(parts, results):
+        found.update(zip(part, targets))
+        cache.put(dict(zip(part, targets)))
+
+    embedder = Embedder(model, path=os.path.join(path, "vectors"))
+    targets = [key for key in dict.fromkeys(found.values()) if key not in embedder.keys]
+    logger.info(f"embedding {len(targets)} targets in {shards} shards")
+    parts = split(targets, shards)
+    vectors = stage(queue, "embed", parts, workers, model, timeout)
+    if targets:
+        embedder.store([key for part in parts for key in part], np.concatenate(vectors))
+
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    if backend == "sharded":
+        options["backend_options"] = dict(
+            shards=shards, resolution=resolution, executor=executor
+        )
+    try:
+        return run_(
+            data,
+            model,
+            parse_cache=cache,
+            vector_cache=os.path.join(path, "vectors"),
+            backend=backend,
+            **options,
+        )
+    finally:
+        cache.close()
+        if executor is not None:
+            executor.shutdown()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Work through a shard queue")
+    parser.add_argument("queue", help="directory of the queue")
+    parser.add_argument("model", help="path of the fastText model")
+    parser.add_argument(
+        "--lease", type=float, default=600.0, help="seconds a task is claimed for"
+    )
+    args = parser.parse_args(arguments)
+
+    # third party
+    import fastText as ft
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    work(args.queue, ft.load_model(args.model), args.lease)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
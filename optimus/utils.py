@@ -1,3 +1,7 @@
+# third party
+import numpy as np
+
+
 def strip(xs):
     """
     WARNING: alters lengths of list, use carefully
@@ -22,3 +26,49 @@ def unpack(xxs):
         unpacked list
     """
     return [x for xs in xxs for x in xs]
+
+
+def intern(xs, index=None):
+    """
+    Number the distinct entries of a list
+
+    Parameters
+    ----------
+    xs : list[hashable]
+
+    index : dict
+        an existing numbering (entry -> number) to extend, new entries
+        are added to it in order of first appearance
+
+    Returns
+    -------
+    tuple[list, numpy.ndarray]
+        the distinct entries in order of first appearance (all the entries
+        of ``index`` if given) and the index into them for every entry of
+        ``xs``
+    """
+    index = {} if index is None else index
+    codes = [index.setdefault(x, len(index)) for x in xs]
+    return list(index), np.asarray(codes, dtype=np.intp)
+
+
+class lazy:
+    """
+    Attribute computed on first access and stored on the instance,
+    like ``functools.cached_property`` (which needs python 3.8)
+
+    Parameters
+    ----------
+    function : function
+        one argument function computing the attribute from the instance
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.__doc__ = function.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.function.__name__] = self.function(instance)
+        return value
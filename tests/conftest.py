@@ -0,0 +1,60 @@
+# third party
+import numpy as np
+import pytest
+
+# project
+from optimus.core import models
+
+
+class Token:
+    def __init__(self, text):
+        self.text, self.lemma_, self.dep_ = text, text.rstrip("s"), "ROOT"
+
+
+class NLP:
+    """
+    spacy stand-in: the last word of a text is its ROOT, lemmatised by
+    dropping trailing s's. It records the texts it parsed and the number
+    of ``pipe`` calls.
+    """
+
+    pipe_names = ["tagger", "parser", "ner"]
+    vocab = {"pizza", "cake", "cheese", "apple", "pear", "peach"}
+
+    def __init__(self):
+        self.parsed, self.batches = [], 0
+
+    def pipe(self, texts, batch_size=None, n_process=1, disable=()):
+        texts = list(texts)
+        self.parsed.extend(texts)
+        self.batches += 1
+        return ([Token((text.split() or [""])[-1])] for text in texts)
+
+
+class Model:
+    """
+    fastText stand-in: a random vector seeded by the word
+    """
+
+    def get_dimension(self):
+        return 4
+
+    def get_word_vector(self, word):
+        seed = sum(map(ord, word)) + len(word)
+        return np.random.RandomState(seed).rand(4).astype(np.float32)
+
+
+@pytest.fixture
+def nlp():
+    """
+    An ``NLP`` registered as the spacy model for the test
+    """
+    nlp = NLP()
+    models.register(("spacy", models.spacy_model), nlp)
+    yield nlp
+    models.clear()
+
+
+@pytest.fixture
+def model():
+    return Model()
@@ -0,0 +1,44 @@
+# project
+from optimus.core import parse
+from optimus.core.cache import ParseCache, namespace
+
+
+def test_cache(tmp_path, nlp):
+    path = str(tmp_path / "parses.db")
+    texts = ["frozen pizzas", "cakes", "frozen pizzas", "rocks"]
+
+    cache = ParseCache(path, regex_dict={})
+    assert cache.parse(texts) == ["pizza", "cake", "pizza", ""]
+    assert cache.parse(texts) == list(parse.parse(texts))
+    assert (cache.hits, cache.misses) == (3, 3)
+    cache.close()
+
+    # a new run only parses what it has not seen
+    nlp.parsed.clear()
+    cache = ParseCache(path, regex_dict={})
+    parsed = cache.parse(texts + ["cheese cakes"])
+    assert parsed == ["pizza", "cake", "pizza", "", "cake"]
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert nlp.parsed == ["cheese cakes"]
+    cache.close()
+
+    # other regexes do not share entries
+    assert ParseCache(path, regex_dict={"x": ""}).get(texts) == {}
+
+
+def test_namespace():
+    assert namespace("a", {}) == namespace("a", {})
+    assert namespace("a", {}) != namespace("b", {})
+    assert namespace("a", {"x": "", "y": ""}) != namespace("a", {"y": "", "x": ""})
+
+
+def test_prune(nlp):
+    cache = ParseCache(":memory:", regex_dict={})
+    cache.parse(["frozen pizzas", "cakes", "rocks"])
+    cache.prune(2)
+    # the oldest entry goes first
+    assert cache.get(["frozen pizzas", "cakes", "rocks"]) == dict(
+        cakes="cake", rocks=""
+    )
+    cache.prune(5)
+    assert len(cache.get(["cakes", "rocks"])) == 2
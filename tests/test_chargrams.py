@@ -0,0 +1,41 @@
+# stdlib
+from math import log
+
+# third party
+from hypothesis import given, strategies as st
+
+# project
+from optimus.core.select import chargrams as cg
+
+
+# the original quadratic implementation, kept as a reference
+def naive_scorer(xs):
+    cgrams = cg.characters(xs)
+    score = (sum(i in j for j in xs) ** 2 * (1 + log(len(i))) for i in cgrams)
+    return max(score)
+
+
+def naive_label(xs):
+    cgrams = cg.characters(xs)
+    score = [sum(i in j for j in xs) ** 2 * (1 + log(len(i))) for i in cgrams]
+    candidate = [cgrams[i] for i, j in enumerate(score) if j == max(score)]
+    return candidate[0]
+
+
+texts = st.lists(st.text(alphabet="abc \n", min_size=3, max_size=25), min_size=1)
+
+
+@given(texts)
+def test_matches_naive(xs):
+    # at least one text needs to have a chargram
+    if not cg.characters(xs):
+        return
+
+    assert cg.scorer(xs) == naive_scorer(xs)
+    assert cg.label(xs) == naive_label(xs)
+
+
+def test_label():
+    xs = ["frozen pizza", "frozn pizza", "pizza", "pizzas"]
+    assert cg.label(xs) == "pizza"
+    assert cg.selection(xs + [""]) == "pizza"
@@ -0,0 +1,93 @@
+# third party
+import numpy as np
+import pytest
+
+# project
+from optimus import optimus
+from optimus.core.checkpoint import Checkpoint, digest
+from optimus.core.fitted import Fitted
+from optimus.optimus import run
+
+
+def test_digest(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("frozen pizza\ncheese\n")
+    lines = ["frozen pizza", "cheese"]
+
+    assert digest(lines, "model", depth=3) == digest(lines, "model", depth=3)
+    assert digest(lines, "model", depth=3) != digest(lines, "model", depth=6)
+    assert digest(lines, "model", depth=3) != digest(lines, "other", depth=3)
+    # a file hashes the same as its lines
+    assert digest(str(path), "model") == digest(lines, "model")
+
+
+def test_checkpoint(tmp_path):
+    ck = Checkpoint(str(tmp_path), "run")
+    assert not ck.has("codes.npy")
+
+    codes = np.arange(10, dtype=np.int32)
+    ck.save("codes.npy", codes)
+    ck.save("state.json", {"depth": 3, "strings": ["pizza", ""]})
+
+    loaded = Checkpoint(str(tmp_path), "run").load("codes.npy")
+    assert isinstance(loaded, np.memmap)
+    assert np.array_equal(loaded, codes)
+    assert ck.load("state.json") == {"depth": 3, "strings": ["pizza", ""]}
+
+
+lines = [
+    "frozen pizzas",
+    "cakes",
+    "cheese",
+    "mild cheese",
+    "apples",
+    "rocks",
+    "tinned peaches",
+    "pears",
+    "cheese",
+    "chocolate cakes",
+]
+thresholds = dict(hypernym=1.0)  # the hypernym tier needs a spacy model
+
+
+class Interrupt(Exception):
+    pass
+
+
+def test_resume(tmp_path, monkeypatch, nlp, model):
+    options = dict(depth=0.1, end_depth=2, stepsize=0.1, **thresholds)
+    expected, full = run(
+        lines, model, fit=str(tmp_path / "expected"), return_stats=True, **options
+    )
+
+    # stop the run at the third depth that is labelled
+    calls, select = [], optimus.select
+
+    def interrupted(*args, **kwargs):
+        calls.append(None)
+        if len(calls) == 3:
+            raise Interrupt
+        return select(*args, **kwargs)
+
+    monkeypatch.setattr(optimus, "select", interrupted)
+    path, fit = str(tmp_path / "checkpoint"), str(tmp_path / "fitted")
+    with pytest.raises(Interrupt):
+        run(lines, model, checkpoint=path, fit=fit, **options)
+    monkeypatch.setattr(optimus, "select", select)
+
+    # the resumed run carries on after the two depths that were saved
+    resumed, stats = run(
+        lines, model, checkpoint=path, fit=fit, return_stats=True, **options
+    )
+    assert resumed.equals(expected)
+    evaluated = full.counters["depths.evaluated"]
+    assert stats.counters["depths.evaluated"] == evaluated - 2
+    assert Fitted.load(fit).depths == Fitted.load(str(tmp_path / "expected")).depths
+
+    # a run that stopped at its target is not continued
+    final = run(lines, model, checkpoint=path, target=3, **options)
+    again, stats = run(
+        lines, model, checkpoint=path, target=3, return_stats=True, **options
+    )
+    assert again.equals(final)
+    assert "depths.evaluated" not in stats.counters
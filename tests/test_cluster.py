@@ -0,0 +1,74 @@
+# third party
+import numpy as np
+
+# project
+from optimus.core import cluster
+
+state = np.random.RandomState(0)
+embedding = np.vstack([state.normal(i, 0.3, (20, 5)) for i in range(4)])
+
+
+def test_cluster():
+    clusters = cluster.cluster(embedding, 3)
+
+    # one cluster number per row, numbered from 1
+    assert len(clusters) == len(embedding)
+    assert set(clusters) == set(range(1, len(set(clusters)) + 1))
+
+
+def test_sweep():
+    depths = [0.5, 1, 2, 4, 8]
+    for depth, clusters in zip(depths, cluster.sweep(embedding, depths)):
+        assert np.array_equal(clusters, cluster.cluster(embedding, depth))
+
+
+def same(xs, ys):
+    """
+    Check that two clusterings are the same partition
+    """
+    return len(set(zip(xs, ys))) == len(set(xs)) == len(set(ys))
+
+
+def test_ward():
+    # unit weights give scipy's ward linkage
+    links = cluster.ward(embedding, np.ones(len(embedding)))
+    assert np.allclose(links, cluster.z(embedding))
+
+
+def test_dedupe():
+    repeats = state.randint(1, 5, len(embedding))
+    full = np.repeat(embedding, repeats, axis=0)
+
+    for depth in [0.5, 1, 2, 4, 8]:
+        deduped = cluster.cluster(full, depth, dedupe=True)
+        assert same(deduped, cluster.cluster(full, depth))
+        # duplicates always share a cluster
+        assert all(len(set(xs)) == 1 for xs in np.split(deduped, repeats.cumsum()[:-1]))
+
+
+def test_minibatch():
+    # well separated blobs come out the same as with the exact backend
+    blobs = np.vstack([state.normal(10 * i, 0.3, (200, 5)) for i in range(4)])
+    approximate = cluster.cluster(blobs, 20, backend="minibatch", centroids=50)
+    assert same(approximate, cluster.cluster(blobs, 20))
+
+    # small inputs are clustered exactly
+    links, leaves = cluster.hierarchy(embedding, backend="minibatch")
+    assert np.allclose(links, cluster.z(embedding))
+
+
+def test_single():
+    # all rows identical, deduplicated to a single observation
+    assert list(cluster.cluster(np.ones((3, 2)), 1, dedupe=True)) == [1, 1, 1]
+
+
+def test_sharded():
+    # shards cut below the lowest merge give the exact hierarchy
+    for depth in [0.5, 1, 2, 4, 8]:
+        sharded = cluster.cluster(embedding, depth, backend="sharded", resolution=0)
+        assert same(sharded, cluster.cluster(embedding, depth))
+
+    # well separated blobs come out the same at depths above the resolution
+    blobs = np.vstack([state.normal(10 * i, 0.3, (100, 5)) for i in range(4)])
+    merged = cluster.cluster(blobs, 20, backend="sharded", resolution=2)
+    assert same(merged, cluster.cluster(blobs, 20))
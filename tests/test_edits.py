@@ -0,0 +1,48 @@
+# stdlib
+import itertools
+
+# third party
+import numpy as np
+import pytest
+
+from hypothesis import given, settings, strategies as st
+
+# project
+from optimus.core.select import edits as ed
+
+text = st.text(alphabet="abcé ", max_size=70)
+
+
+@settings(deadline=None)
+@given(text, text)
+def test_levenshtein(x, y):
+    textacy = pytest.importorskip("textacy.similarity")
+    assert ed.levenshtein(x, y) == textacy.levenshtein(x, y)
+    assert ed.distance(x, y) == ed.distance(y, x)
+
+
+def test_matrix():
+    xs = ["frozen pizza", "frozn pizza", "pizza", "", "frozen pizza"]
+    xs_ = [x for x in xs if x]
+    pairs = [ed.levenshtein(*ys) for ys in itertools.combinations(xs_, 2)]
+    full = [[ed.levenshtein(x, y) for y in xs_] for x in xs_]
+
+    assert np.isclose(ed.condition(xs), np.mean(pairs))
+    assert np.array_equal(ed.editMatrix(xs), full)
+    assert ed.selection(xs) == "frozen pizza"
+
+    # duplicates are weights on the distinct texts
+    texts, weights, similarity = ed.matrix(xs_)
+    assert texts == ["frozen pizza", "frozn pizza", "pizza"]
+    assert weights.tolist() == [2, 1, 1]
+    assert similarity.shape == (3, 3)
+
+
+def test_estimate():
+    state = np.random.RandomState(0)
+    xs = ["".join(state.choice(list("abcd"), state.randint(3, 12))) for _ in range(300)]
+
+    exact = ed.condition(xs)
+    estimate = ed.condition(xs, limit=1000, error=0.005)
+    # within the error bound of the 95% confidence interval
+    assert abs(estimate - exact) <= 0.005
@@ -0,0 +1,106 @@
+# third party
+import numpy as np
+
+# project
+from optimus.core.embedding.fasttext import embed, Embedder
+
+
+class Model:
+    """
+    Tiny stand-in for a fastText model that counts lookups
+    """
+
+    def __init__(self, dimension=4):
+        self.dimension = dimension
+        self.calls = 0
+
+    def get_dimension(self):
+        return self.dimension
+
+    def get_word_vector(self, word):
+        self.calls += 1
+        seed = sum(map(ord, word)) + len(word)
+        return np.random.RandomState(seed).rand(self.dimension).astype(np.float32)
+
+
+texts = ["pizza", "chocolate", "pizza", "", "biscuits", "pizza", "chocolate"]
+
+
+def test_embedder_matches_embed():
+    model = Model()
+    vectors = Embedder(model)(texts)
+
+    assert vectors.dtype == np.float32
+    assert vectors.shape == (len(texts), model.dimension)
+    assert np.array_equal(vectors, np.stack(list(embed(texts, Model()))))
+
+
+def test_embedder_deduplicates():
+    model = Model()
+    embedder = Embedder(model)
+    embedder(texts)
+    embedder(texts)
+
+    # each unique text is only embedded once across calls
+    assert model.calls == len(set(texts))
+
+
+def test_embedder_disk_cache(tmp_path):
+    first = Embedder(Model(), path=str(tmp_path))(texts)
+
+    model = Model()
+    embedder = Embedder(model, path=str(tmp_path))
+    second = embedder(texts)
+
+    # only the probe words for the fingerprint are embedded again
+    assert model.calls == 5
+    assert np.array_equal(first, second)
+
+
+def test_store_words(tmp_path):
+    from optimus.core.embedding import store
+
+    model = Model()
+    store.export(model, str(tmp_path), words=["pizza", "chocolate", "pizza"])
+    vectors = store.Store(str(tmp_path))
+
+    assert vectors.get_dimension() == model.dimension
+    assert np.array_equal(
+        vectors.get_word_vector("pizza"), model.get_word_vector("pizza")
+    )
+    # words that were not exported fall back to zeros
+    assert not vectors.get_word_vector("biscuits").any()
+
+
+def test_store_subwords():
+    from optimus.core.embedding import store
+
+    # buckets fastText gives with the default minn=3, maxn=6, bucket=2000000
+    expected = {
+        "pizza": [1461032, 541334, 1384964, 1398399, 980120, 1894726, 331365]
+        + [1078977, 1472160, 811475, 1521175, 1231996, 662758, 1189358],
+        "ünï": [461654, 60128, 604154, 649558, 1291320, 1031999],
+    }
+    for word, buckets in expected.items():
+        assert store.subwords(word, 3, 6, 2000000) == buckets
+
+
+def test_embedder_interrupted_store(tmp_path):
+    embedder = Embedder(Model(), path=str(tmp_path))
+    embedder(["pizza", "chocolate"])
+
+    # a store stopped part way through writing its keys
+    with open(f"{embedder.path}/vectors.f32", "ab") as handle:
+        handle.write(np.ones((2, 4), dtype=np.float32).tobytes())
+    with open(f"{embedder.path}/keys.jsonl", "a") as handle:
+        handle.write('"biscuits"\n"crack')
+
+    embedder = Embedder(Model(), path=str(tmp_path))
+    assert list(embedder.keys) == ["pizza", "chocolate", "biscuits"]
+
+    # the files were cut back in step, so new entries line up
+    embedder(["crackers"])
+    vectors = Embedder(Model(), path=str(tmp_path))(["crackers", "pizza"])
+    assert np.array_equal(
+        vectors, np.stack(list(embed(["crackers", "pizza"], Model())))
+    )
@@ -0,0 +1,65 @@
+# third party
+import numpy as np
+
+# project
+from optimus.core.fitted import Fitted
+from optimus.optimus import run, update
+
+vectors = {
+    "pizza": [0.0, 0.0],
+    "pizzas": [0.2, 0.0],
+    "cake": [5.0, 5.0],
+    "cakes": [5.0, 5.2],
+    "food": [2.5, 2.5],
+    "rock": [40.0, 40.0],
+}
+embed = lambda texts: np.array([vectors[text] for text in texts])
+strings = ["pizza", "pizzas", "cake", "cakes", "food"]
+
+
+def fitted():
+    fit = Fitted(strings, fingerprint="model")
+    embedding = embed(strings[:4])
+    fit.add(1, embedding, np.array([1, 1, 2, 2]), np.array([1, 3, 1, 1]), [0, 0, 2, 2])
+    fit.add(10, embedding, np.array([1, 1, 1, 1]), np.array([1, 3, 1, 1]), [4] * 4)
+    return fit
+
+
+def test_add():
+    fit = fitted()
+    assert fit.depths == ["1", "10"]
+    # centroids are weighted by the number of lines
+    assert np.allclose(fit.centroids["1"], [[0.15, 0.0], [5.0, 5.1]])
+    assert fit.sizes["1"].tolist() == [4, 2]
+    assert fit.labels["1"].tolist() == [0, 2]
+
+
+def test_assign():
+    table, labels, outside = fitted().assign(["pizzas", "cakes", "rock"], embed)
+    assert table == strings + ["rock"]
+    assert labels["1"].tolist() == [0, 2, 2]
+    assert labels["10"].tolist() == [4, 4, 4]
+    assert outside.tolist() == [False, False, True]
+
+
+def test_save(tmp_path):
+    path = str(tmp_path / "fitted")
+    fitted().save(path)
+    loaded = Fitted.load(path)
+    assert (loaded.strings, loaded.fingerprint) == (strings, "model")
+    assert loaded.assign(["cakes"], embed)[1]["1"].tolist() == [2]
+
+
+def test_update(tmp_path, nlp, model):
+    lines = ["frozen pizzas", "cakes", "cheese", "mild cheese", "apples", "rocks"]
+    path = str(tmp_path / "fitted")
+    thresholds = dict(hypernym=1.0)  # the hypernym tier needs a spacy model
+
+    result = run(lines, model, fit=path, **thresholds)
+    # lines the model was fitted on get the labels they were given
+    assert update(lines, model, path).equals(result)
+    # drifted lines are run again together with the history
+    fresh = update(["cheese"], model, path, history=lines, drift=-1, **thresholds)
+    assert fresh.equals(
+        run(lines + ["cheese"], model, **thresholds).iloc[6:].reset_index(drop=True)
+    )
@@ -0,0 +1,91 @@
+# stdlib
+import re
+import itertools
+
+# third party
+from nltk.corpus.reader.wordnet import Synset
+
+# project
+from optimus.core import models
+from optimus.core.select import hypernyms as hn
+
+
+def synset(name, *parents):
+    syn = Synset(None)
+    syn._name = name
+    syn.hypernyms = lambda: list(parents)
+    syn.instance_hypernyms = lambda: []
+    return syn
+
+
+entity = synset("entity.n.01")
+food = synset("food.n.01", entity)
+dish = synset("dish.n.02", food)
+fruit = synset("fruit.n.01", food)
+pizza = synset("pizza.n.01", dish)
+pie = synset("pie.n.01", dish, food)
+apple = synset("apple.n.01", fruit)
+taxonomy = {"pizza": [pizza], "pie": [pie], "apple": [apple, fruit], "rock": []}
+
+
+class Token:
+    def __init__(self, text, dep="ROOT"):
+        self.text = self.lemma_ = text
+        self.dep_, self.pos_, self.lang_ = dep, "NOUN", "en"
+
+
+class NLP:
+    pipe_names = ["tagger", "parser", "ner"]
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        *words, root = re.findall(r"[^\s-]+|-", text)
+        return [Token(word, "amod") for word in words] + [Token(root)]
+
+    def pipe(self, texts, disable=()):
+        return map(self, texts)
+
+
+class Wordnet:
+    def __init__(self, token, lang):
+        self.token = token
+
+    def synsets(self):
+        return taxonomy[self.token.text]
+
+
+def test_lca():
+    hn.clear()
+    syns = [entity, food, dish, fruit, pizza, pie, apple]
+    for i, j in itertools.product(syns, syns):
+        assert list(hn.lca(i, j)) == i.lowest_common_hypernyms(j)
+
+
+def test_hypernyms():
+    hn.clear()
+    nlp = NLP()
+    models.register(("spacy", models.spacy_model), nlp)
+    models.register("wordnet", Wordnet)
+
+    assert hn.hypernyms(["pizza", "hot pie"]) == "dish"
+    assert hn.hypernyms(["rock", "pizza", "apple"]) == "food"
+    assert hn.hypernyms(["rock", "rock"]) == ""
+
+    # texts are only parsed once
+    hn.hypernyms(["hot pie", "apple"])
+    assert sorted(nlp.calls) == ["apple", "hot pie", "pizza", "rock"]
+    models.clear()
+
+
+def test_split_word():
+    hn.clear()
+    models.register(("spacy", models.spacy_model), NLP())
+    models.register("wordnet", Wordnet)
+
+    # a word split into several tokens is parsed for its keyword
+    assert hn.keywords(["apple-pie"])[0].text == "pie"
+    assert hn.hypernyms(["pizza", "apple-pie"]) == "dish"
+    models.clear()
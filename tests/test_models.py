@@ -0,0 +1,35 @@
+# stdlib
+import sys
+import subprocess
+
+# project
+from optimus.core import models
+
+
+def test_fetch_loads_once():
+    calls = []
+    loader = lambda: calls.append(1) or object()
+
+    first = models.fetch("test-resource", loader)
+    second = models.fetch("test-resource", loader)
+
+    # the loader only runs on first use and the same object is shared
+    assert first is second
+    assert len(calls) == 1
+
+
+def test_regexes():
+    regexes = models.regexes()
+
+    # the packaged regex table is found regardless of the working directory
+    assert isinstance(regexes, dict)
+    assert len(regexes) > 0
+
+
+def test_lazy_imports():
+    # importing the selection tiers does not load spacy
+    code = "import sys, optimus.core.select; print('spacy' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,98 @@
+# third party
+import numpy as np
+import pandas as pd
+import pytest
+
+# project
+from optimus.core.cluster import hierarchy, cut
+from optimus.core.fitted import Fitted
+from optimus.optimus import chunks, write, schedule, count, run, update
+
+text = "frozen pizza\r\nchocolate\n\ncheese\x0bcake\nbread"
+
+
+def test_chunks(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text(text)
+
+    whole = list(chunks(str(path)))
+    assert whole == [text.splitlines()]
+    # chunked reading splits the same way as reading the whole file
+    for chunksize in (1, 2, 3, 10):
+        parts = list(chunks(str(path), chunksize))
+        assert [line for part in parts for line in part] == text.splitlines()
+        assert all(len(part) <= chunksize + 1 for part in parts)
+
+    lines = text.splitlines()
+    assert list(chunks(lines, 2)) == [lines[i : i + 2] for i in range(0, len(lines), 2)]
+
+
+def test_write(tmp_path):
+    output = str(tmp_path / "out.csv")
+    frame = pd.DataFrame({"3": ["pizza", "cheese"], "original": ["a", "b"]})
+
+    header = write(frame, output, None)
+    write(frame.set_index(pd.RangeIndex(2, 4)), output, header)
+    expected = pd.concat([frame] * 2, ignore_index=True)
+    assert pd.read_csv(output, index_col=0).equals(expected)
+
+
+def test_schedule():
+    assert schedule(3, 15, 3) == [3, 6, 9, 12, 15]
+    assert schedule(3, 14, 3) == [3, 6, 9, 12]
+    assert schedule(0.1, 0.4, 0.1) == [0.1, 0.2, 0.3, 0.4]
+    assert schedule(5, 3, 1) == []
+
+
+def test_count():
+    state = np.random.RandomState(0)
+    embedding = np.vstack([state.normal(i, 0.3, (20, 5)) for i in range(4)])
+    links, leaves = hierarchy(embedding)
+    for depth in [0, 0.5, 1, 2, 4, 8, 100]:
+        assert count(depth, links) == len(set(cut(depth, links, leaves)))
+
+
+lines = ["frozen pizzas", "cakes", "cheese", "apples", "tinned peaches", "pears"]
+thresholds = dict(hypernym=1.0)  # the hypernym tier needs a spacy model
+
+
+def test_depths(tmp_path, nlp, model):
+    result, stats = run(lines, model, 0.1, 50, 0.1, return_stats=True, **thresholds)
+    assert [*result.columns][:3] == ["0.1", "0.2", "0.3"]
+    assert [*result.columns][-3:] == ["50.0", "original", "current_labels"]
+    # only the few depths that change the clusters are labelled
+    counters = stats.counters
+    assert counters["depths.evaluated"] + counters["depths.skipped"] == 500
+    assert counters["depths.evaluated"] < 50
+
+    # the depths past the fixed point are copies, in the fitted model too
+    path = str(tmp_path / "fitted")
+    fitted = run(lines, model, 0.1, 50, 0.1, fit=path, **thresholds)
+    assert fitted.equals(result)
+    assert "50.0" in Fitted.load(path).aliases
+    assert update(lines, model, path).equals(result)
+
+    result = run(lines, model, 0.1, 50, 0.1, target=2, **thresholds)
+    assert result["current_labels"].nunique() <= 2
+    # the target depth is rounded like the scheduled ones
+    depth = [*result.columns][-3]
+    assert depth == f"{round(float(depth), 9)}"
+
+    with pytest.raises(ValueError):
+        run(lines, model, 5, 3, 1, **thresholds)
+
+
+def test_generator(nlp, model):
+    # the input is read twice, a generator is only read once
+    result = run((line for line in lines), model, **thresholds)
+    assert result.equals(run(lines, model, **thresholds))
+
+
+def test_file(tmp_path, nlp, model):
+    path = tmp_path / "data.txt"
+    path.write_text("\n".join(lines) + "\r\ncheese\x0bcakes\n")
+    # an open file gives the same lines as its path
+    with open(path) as handle:
+        result = run(handle, model, **thresholds)
+    assert result.equals(run(str(path), model, **thresholds))
+    assert "\n" not in "".join(result["original"])
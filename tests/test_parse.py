@@ -1,3 +1,6 @@
+# third party
+from hypothesis import given, strategies as st
+
 # project
 from optimus.core import parse
 
@@ -13,3 +16,25 @@ def test_parse():
     assert len(example) == len(parsed)
     # check that all are strings
     assert all(map(lambda entry: isinstance(entry, str), parsed))
+
+
+def test_parse_matches_single():
+    batched = list(parse.parse(example, batch_size=7))
+    single = list(map(parse.parse_, example))
+
+    # batching must not change the order or the results
+    assert batched == single
+
+
+@given(st.lists(st.text(alphabet="abcdefghijklmnopqrstuvwxyzAZ \n\t019,./!#`[]()\\_")))
+def test_cleaner(strings):
+    # the compiled cleaner must behave exactly like the composed one
+    assert parse.cleaner().clean_batch(strings) == list(parse.default_cleanerM(strings))
+
+
+def test_fuse():
+    rules = [("[0-9]", ""), ("a", "b"), ("b", "c")]
+
+    # "b" can not join the pass as "a" is replaced with a "b"
+    assert parse.fuse(rules) == [[("[0-9]", ""), ("a", "b")], [("b", "c")]]
+    assert parse.Cleaner(dict(rules[::-1]))("a1b") == "cc"
@@ -0,0 +1,52 @@
+# third party
+import numpy as np
+
+# project
+from optimus.core.select import build_represent
+from optimus.core.select import profile as pr
+from optimus.core.select import edits as ed
+from optimus.core.select import chargrams as cg
+
+xs = ["frozen pizza", "frozen pizzas", "", "frozen pizza"]
+
+
+def test_profile():
+    p = pr.Profile(tuple(xs))
+    assert p.members == ["frozen pizza", "frozen pizzas", "frozen pizza"]
+    assert p.tokens[1] == ["frozen", "pizzas"]
+    assert p.chargrams == cg.index(p.members)
+    assert np.array_equal(p.edits.matrix, ed.matrix(p.members).matrix)
+    # computed once
+    assert p.edits is p.edits
+
+
+def test_memoised():
+    pr.clear()
+    assert pr.profile(xs) is pr.profile(np.array(xs))
+    assert pr.profile(xs) is not pr.profile(xs[:2])
+
+
+def test_represent(monkeypatch):
+    pr.clear()
+    represent = build_represent()
+    label = represent(xs)
+    assert label == "frozen pizza"
+
+    # the same group is not scored again
+    monkeypatch.setattr(ed, "selection", None)
+    assert represent(np.array(xs)) == label
+    # other thresholds are scored separately
+    assert build_represent(edit=1.0, wordgram=0.0)(xs) == "frozen"
+
+
+def test_lazy_conditions():
+    pr.clear()
+    p = pr.profile(["pizza"])
+    # a single text is decided without building the matrix or the index
+    assert ed.condition(p.members, similarity=lambda: p.edits) == 0.0
+    assert cg.condition(p.members, lambda: p.chargrams) == 0.0
+    assert "edits" not in vars(p) and "chargrams" not in vars(p)
+
+    # once labelled, only the labels are kept
+    build_represent()(xs)
+    assert vars(pr.profile(xs)).keys() == {"group", "labels"}
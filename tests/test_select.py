@@ -0,0 +1,81 @@
+# stdlib
+from concurrent.futures import ProcessPoolExecutor
+
+# third party
+import numpy as np
+
+# project
+from optimus.core.select import select, schedule, build
+from optimus.core.select import profile as pf
+from optimus.core.select import edits as ed
+
+xs = [
+    "frozen pizza",
+    "frozen pizzas",
+    "cheese",
+    "cheddar cheese",
+    "mild cheddar cheese",
+    "apple",
+    "apples",
+    "",
+    "pear",
+    "tinned peach",
+]
+clusters = np.array([1, 1, 2, 2, 2, 3, 3, 4, 4, 5])
+thresholds = dict(hypernym=1.0)  # the hypernym tier needs a spacy model
+
+
+def test_schedule():
+    groups = [["a"], ["b", "c", "d"], ["e", "f"], ["g"]]
+    chunks = schedule(groups, chunksize=3)
+    # largest first, small groups packed together
+    assert chunks == [[1], [2, 0], [3]]
+    assert sorted(i for chunk in chunks for i in chunk) == [0, 1, 2, 3]
+
+
+def test_parallel():
+    pf.clear()
+    serial = list(select(xs, clusters, **thresholds))
+    pf.clear()
+    with ProcessPoolExecutor(2) as executor:
+        parallel = list(
+            select(xs, clusters, executor=executor, chunksize=3, **thresholds)
+        )
+    assert parallel == serial
+
+
+def test_coded():
+    labels = list(select(xs, clusters, **thresholds))
+    table, codes = select(xs, clusters, coded=True, **thresholds)
+    assert codes.dtype == np.int32
+    assert len(table) == len(set(table))
+    assert [table[code] for code in codes] == labels
+
+
+def test_build():
+    ids = np.array([7, 3, 7, -1, 3, 7])
+    texts = ["a", "b", "c", "d", "e", "f"]
+    groups = [list(group) for group in build(texts, ids)]
+    # grouped in order of cluster number, rows keep their order
+    assert groups == [["d"], ["b", "e"], ["a", "c", "f"]]
+    assert list(build([], np.array([], dtype=int))) == []
+
+
+def test_sparse_ids():
+    # cluster numbers do not need to be contiguous
+    serial = list(select(xs, clusters, **thresholds))
+    assert list(select(xs, clusters * 10 + 5, **thresholds)) == serial
+
+
+def test_edit_limit(monkeypatch):
+    estimated = []
+    estimate = ed.estimate
+    monkeypatch.setattr(
+        ed, "estimate", lambda xs, error: estimated.append(xs) or estimate(xs, error)
+    )
+    pf.clear()
+    exact = list(select(xs, clusters, **thresholds))
+    # clusters of more than one pair are estimated, with the same labels here
+    pf.clear()
+    assert list(select(xs, clusters, edit_limit=1, **thresholds)) == exact
+    assert sorted(map(len, estimated)) == [3]
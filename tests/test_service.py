@@ -0,0 +1,77 @@
+# stdlib
+import os
+import asyncio
+
+# third party
+import pytest
+
+# project
+from optimus.core import models
+from optimus.optimus import run
+from optimus.service import Service, serve, connect, call
+
+lines = ["frozen pizzas", "cakes", "cheese", "mild cheese", "apples", "rocks"]
+thresholds = dict(hypernym=1.0)  # the hypernym tier needs a spacy model
+
+
+@pytest.fixture
+def nlp(nlp):
+    # the service warms up wordnet as well
+    models.register("wordnet", object)
+    return nlp
+
+
+async def session(service, unix, requests):
+    server = asyncio.ensure_future(serve(service, unix=unix))
+    while not os.path.exists(unix):
+        await asyncio.sleep(0.01)
+
+    async def request(method, path, body=None):
+        connection = await connect(unix=unix)
+        try:
+            return await call(connection, method, path, body)
+        finally:
+            connection[1].close()
+
+    results = await asyncio.gather(*[request(*r) for r in requests])
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+    return results
+
+
+def test_parse(tmp_path, nlp, model):
+    service = Service(model, delay=0.05)
+    requests = [("POST", "/parse", {"lines": lines[i : i + 2]}) for i in range(6)]
+    results = asyncio.run(session(service, str(tmp_path / "sock"), requests))
+
+    expected = ["pizza", "cake", "cheese", "cheese", "apple", ""]
+    assert [body["targets"] for _, body in results] == [
+        expected[i : i + 2] for i in range(6)
+    ]
+    # the concurrent requests share a batch and a pass through spacy
+    assert service.stats.counters["service.batches"] < len(requests)
+    assert nlp.batches == 1
+
+
+def test_label(tmp_path, nlp, model):
+    service = Service(model, **thresholds)
+    requests = [
+        ("POST", "/label", {"lines": lines}),
+        ("POST", "/label", {"lines": "pizza"}),
+        ("GET", "/missing"),
+    ]
+    results = asyncio.run(session(service, str(tmp_path / "sock"), requests))
+
+    expected = run(lines, model, **thresholds).astype(str).to_dict("records")
+    assert results[0] == (200, {"labels": expected})
+    assert [code for code, _ in results[1:]] == [400, 404]
+
+
+def test_cache_size(nlp, model):
+    service = Service(model, cache_size=2)
+    service.warmup()
+    for i in range(0, 6, 2):
+        service.process([("parse", lines[i : i + 2])])
+    # only the latest parses stay resident
+    assert list(service.cache.get(lines)) == ["apples", "rocks"]
+    service.cache.close()
@@ -0,0 +1,97 @@
+# stdlib
+import os
+import time
+
+# third party
+import pytest
+
+# project
+from optimus import shard
+from optimus.optimus import run
+
+
+lines = [
+    "frozen pizzas",
+    "cakes",
+    "cheese",
+    "mild cheese",
+    "apples",
+    "rocks",
+    "tinned peaches",
+    "pears",
+    "cheese",
+    "chocolate cakes",
+]
+thresholds = dict(hypernym=1.0)  # the hypernym tier needs a spacy model
+
+
+def test_queue(tmp_path):
+    queue = shard.Queue(str(tmp_path))
+    queue.put("a", {"kind": "parse", "payload": []})
+    # a task is only handed out once
+    assert queue.claim() == ("a", {"kind": "parse", "payload": []})
+    assert queue.claim() is None
+
+    queue.finish("a", "json", [["x", "y"]])
+    assert queue.wait(["a"]) == [[["x", "y"]]]
+
+    # the files of collected tasks are removed
+    queue.remove(["a"])
+    assert not any(os.listdir(tmp_path / name) for name in ("tasks", "claimed"))
+    assert not os.listdir(queue.results.path)
+
+
+def test_lease(tmp_path):
+    queue = shard.Queue(str(tmp_path), lease=0)
+    queue.put("a", {"kind": "parse", "payload": []})
+    assert queue.claim()[0] == "a"
+
+    # the worker of the claim is gone, the task is handed out again
+    time.sleep(0.01)
+    assert queue.claim()[0] == "a"
+    assert queue.pending() == 0
+
+    # no worker takes the task
+    with pytest.raises(TimeoutError):
+        queue.wait(["a"], interval=0.01, timeout=0.05)
+
+
+def test_split():
+    parts = shard.split(lines, 3)
+    assert sorted(key for part in parts for key in part) == sorted(lines)
+    # the same key always ends up in the same shard
+    assert parts == shard.split(lines, 3)
+
+
+def test_run(tmp_path, nlp, model):
+    single = run(lines, model, **thresholds)
+    sharded = shard.run(
+        lines, model, str(tmp_path), shards=3, workers=2, resolution=0, **thresholds
+    )
+    assert sharded.equals(single)
+
+    # a second run finds everything in the caches
+    again = shard.run(lines, model, str(tmp_path), shards=3, workers=0, **thresholds)
+    assert again.equals(single)
+    queue = tmp_path / "queue"
+    assert not any(os.listdir(queue / name) for name in ("tasks", "claimed"))
+    assert not os.listdir(queue / "results")
+
+    # without workers nothing parses the new lines
+    with pytest.raises(TimeoutError):
+        shard.run(["sliced peaches"], model, str(tmp_path), workers=0, timeout=0.1)
+
+    # the options of the backend go into the checkpoint digest
+    checkpoint = str(tmp_path / "checkpoint")
+    for _ in range(2):
+        resumed = shard.run(
+            lines,
+            model,
+            str(tmp_path),
+            shards=3,
+            workers=2,
+            resolution=0,
+            checkpoint=checkpoint,
+            **thresholds
+        )
+        assert resumed.equals(single)
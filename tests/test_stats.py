@@ -0,0 +1,44 @@
+# stdlib
+import json
+
+# third party
+import numpy as np
+
+# project
+from optimus.core.stats import Stats
+from optimus.core.select import select
+from optimus.core.select import profile as pf
+
+xs = ["frozen pizza", "frozen pizzas", "cheese", "cheddar cheese", "apple"]
+clusters = np.array([1, 1, 2, 2, 3])
+
+
+def test_stats(tmp_path):
+    log = str(tmp_path / "metrics.jsonl")
+    stats = Stats(log=log)
+
+    with stats.timer("parse"):
+        pass
+    with stats.timer("select.edit", record=False):
+        pass
+    stats.count("lines", 5)
+    stats.histogram("clusters.3", np.array([1, 1, 2, 3, 9]), depth=3)
+
+    assert set(stats.timers) == {"parse", "select.edit"}
+    assert stats.histograms["clusters.3"] == {1: 2, 2: 2, 8: 1}
+
+    records = [json.loads(line) for line in open(log)]
+    assert [record.get("stage") for record in records] == ["parse", None]
+    assert records[1]["depth"] == 3
+
+
+def test_select_stats():
+    pf.clear()
+    stats = Stats()
+    list(select(xs, clusters, stats=stats, hypernym=1.0))
+    list(select(xs, clusters, stats=stats, hypernym=1.0))
+
+    # every group is counted once by the tier that labelled it
+    tiers = sum(n for name, n in stats.counters.items() if name != "select.memoised")
+    assert tiers == 3
+    assert stats.counters["select.memoised"] == 3
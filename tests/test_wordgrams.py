@@ -0,0 +1,53 @@
+# third party
+import numpy as np
+
+# project
+from optimus.core.select import wordgrams as wg
+from optimus.core.select import defaults
+
+xs = ["frozen pizza large", "frozen pizza small", "pizza frozen", "cheese pizza"]
+
+
+def test_label():
+    # "pizza" is in every text
+    assert wg.label(xs) == "pizza"
+    # ties go to the ngram seen first
+    assert wg.label(["red car", "blue car", "red bus", "blue bus"]) == "red"
+
+
+def test_condition():
+    # every text only contains itself, the longest scores highest
+    assert wg.condition(xs) == wg.score((0, 1, 2), {(0, 1, 2): 1})
+    assert wg.condition(["pizza"]) == 0.0
+    # containment is by substring, "cheese" is part of all three texts and
+    # clears the default threshold
+    assert (
+        wg.condition(["cheese", "cheeses", "cheesecake"]) == 9.0 > defaults["wordgram"]
+    )
+
+
+def test_contained():
+    words = ["pizza", "pizzas", "cheese", "frozen", "za", "s"]
+    state = np.random.RandomState(0)
+    texts = [" ".join(state.choice(words, state.randint(1, 4))) for _ in range(60)]
+
+    def reference(xs):
+        return max(
+            sum(i in j for j in xs) ** 2 * (1 + np.log(len(i.split()))) for i in xs
+        )
+
+    assert wg.contained(["pizza", "pizzas", "pizza", "za"]) == dict(
+        pizza=3, pizzas=1, za=4
+    )
+    assert np.isclose(wg.scorer(texts), reference(texts))
+
+
+def test_precomputed_table():
+    ngrams = wg.table([x.split() for x in xs])
+    assert wg.selection(xs, ngrams) == wg.selection(xs)
+
+
+def test_blank():
+    # texts without words do not score
+    assert wg.scorer(["frozen pizza", " "]) == wg.scorer(["frozen pizza"])
+    assert wg.condition([" ", "  "]) == 0.0